@@ -0,0 +1,307 @@
+"""Scaling benchmarks of the issue parsing and aggregation hot paths
+
+Each function is run over synthetic PIs (see synthetic.py) at several multiples of a base PI size, reporting
+its time, throughput and peak (traced) memory, and how its time grows with the PI size. The full parse of
+issues is dominated by business durations counted from DEFAULTTIME (1970), so it is only run up to
+FULL_PARSE_MAX_SCALE, and its memory is only traced while runs are short enough. Results are saved per commit
+so they can be compared, e.g.:
+
+    python benchmarks/bench_hot_paths.py
+    python benchmarks/bench_hot_paths.py --scales 1 10 --compare benchmarks/results/<commit>.json
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+from copy import deepcopy
+from datetime import datetime
+
+from rich.console import Console
+from rich.table import Table
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BASE_DIR, "..", "pitools"))
+
+from synthetic import generate_pi  # noqa: E402
+from utils.issue_parsing import (_calc_business_dur, _walk_changelog, dc, extract_issue_info,  # noqa: E402
+                                 extract_issues_info)
+from utils.warning_rules import compile_rules  # noqa: E402
+import pi_overview  # noqa: E402
+
+console = Console()
+
+JIRA_CONF = {"url": "https://jira.example.com", "teamName": "Crewmates"}
+
+# time exponent (log of the time ratio / log of the size ratio) above which a function is flagged as superlinear
+SUPERLINEAR = 1.2
+
+# largest scale the full parse benchmarks are run at, and the time (s) of a run above which memory isn't traced
+FULL_PARSE_MAX_SCALE = 10
+TRACE_BUDGET = 10
+
+
+def _measure(func, repeat):
+    """Best time of repeat runs (runs stop early once they add up to more than a few seconds), and the peak
+    memory allocated by a separate, traced, run (None if a run takes longer than TRACE_BUDGET, as tracing
+    slows it down severalfold)"""
+
+    times = list()
+
+    while len(times) < repeat and sum(times) < 5:
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    if min(times) > TRACE_BUDGET:
+        return min(times), None
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(times), peak
+
+
+def _bench_extract_issue_info(pi):
+    _, issues, _ = pi
+    return len(issues), lambda: [extract_issue_info(JIRA_CONF, issue, checkWarnings=False) for issue in issues]
+
+
+def _bench_walk_changelog(pi):
+    _, issues, _ = pi
+    changelogs = [(issue["key"], issue["changelog"]["histories"], issue["fields"]["customfield_10007"])
+                  for issue in issues]
+
+    return len(changelogs), lambda: [_walk_changelog(*changelog) for changelog in changelogs]
+
+
+def _status_periods(issues):
+    """The periods _walk_changelog passes to _calc_business_dur: from DEFAULTTIME to each issue's first status
+    change, and between its following status changes"""
+
+    fromDefault, between = list(), list()
+
+    for issue in issues:
+        histories = issue["changelog"]["histories"]
+        times = sorted(datetime.strptime(history["created"], '%Y-%m-%dT%H:%M:%S.%f%z') for history in histories
+                       if any(item["field"] == "status" for item in history["items"]))
+
+        fromDefault.extend((dc.DEFAULTTIME, timestamp) for timestamp in times[:1])
+        between.extend(zip(times, times[1:]))
+
+    return fromDefault, between
+
+
+def _bench_calc_business_dur(pi):
+    _, between = _status_periods(pi[1])
+
+    return len(between), lambda: [_calc_business_dur(*period) for period in between]
+
+
+def _bench_calc_business_dur_from_default(pi):
+    fromDefault, _ = _status_periods(pi[1])
+
+    return len(fromDefault), lambda: [_calc_business_dur(*period) for period in fromDefault]
+
+
+def _epic_metrics(pi):
+    """Overview epics with their parsed children, as collected by pi_overview.get_issues"""
+
+    epics, issues, _ = pi
+    rules = compile_rules(JIRA_CONF)
+
+    # the metrics don't use status timings, which would make this a full parse
+    infos = extract_issues_info(JIRA_CONF, [{**issue, "changelog": None} for issue in issues], rules)
+    res = {epic["key"]: deepcopy(pi_overview.dc.defaultEpic) | extract_issue_info(JIRA_CONF, epic, False)
+           for epic in epics}
+
+    for info in infos:
+        epic = res.setdefault(info.get("epicKey"), deepcopy(pi_overview.dc.defaultEpic))
+        epic["iters"].add(info.get("iterNo"))
+        epic["children"][info.get("key")] = info
+
+    return res
+
+
+def _bench_get_metrics(pi):
+    epics = _epic_metrics(pi)
+
+    def _run():
+        with pi_overview.dc.scope(iterations=pi[2]):
+            pi_overview.dc.metrics["epics"] = epics
+            pi_overview.get_metrics()
+
+    return sum(len(epic["children"]) for epic in epics.values()), _run
+
+
+def _bench_print_epic_distribution(pi):
+    epics = _epic_metrics(pi)
+
+    def _run():
+        with pi_overview.dc.scope(iterations=pi[2], jiraConf=JIRA_CONF,
+                                  console=Console(file=io.StringIO(), width=200)):
+            pi_overview.print_epic_distribution(epics)
+
+    return sum(len(epic["children"]) for epic in epics.values()), _run
+
+
+# benchmarks running the full parse of issues (i.e. business durations from DEFAULTTIME)
+FULL_PARSE = ("extract_issue_info", "_walk_changelog", "_calc_business_dur_from_default")
+
+BENCHMARKS = {
+    "extract_issue_info"             : _bench_extract_issue_info,
+    "_walk_changelog"                : _bench_walk_changelog,
+    "_calc_business_dur"             : _bench_calc_business_dur,
+    "_calc_business_dur_from_default": _bench_calc_business_dur_from_default,
+    "get_metrics"                    : _bench_get_metrics,
+    "print_epic_distribution"        : _bench_print_epic_distribution,
+}
+
+
+def get_commit():
+    """Short hash of the benchmarked commit, marked if the tree has uncommitted changes"""
+
+    def _git(*args):
+        return subprocess.run(["git", *args], cwd=BASE_DIR, capture_output=True, text=True).stdout.strip()
+
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+
+    return commit + ("-dirty" if _git("status", "--porcelain", "--untracked-files=no") else "")
+
+
+def run_benchmarks(names, scales, nIssues, changelogDepth, nDisciplines, nEpics, repeat):
+    results = {name: list() for name in names}
+
+    for scale in scales:
+        console.log(f"Generating {nIssues * scale} issues ({scale}x)...")
+
+        pi = generate_pi(nIssues=nIssues * scale, changelogDepth=changelogDepth, nDisciplines=nDisciplines,
+                         nEpics=nEpics * scale)
+
+        for name in names:
+            if name in FULL_PARSE and scale > FULL_PARSE_MAX_SCALE:
+                console.log(f"{name} {scale}x: skipped (full parse, above {FULL_PARSE_MAX_SCALE}x)")
+                continue
+
+            items, func = BENCHMARKS[name](pi)
+            seconds, peak = _measure(func, repeat)
+
+            results[name].append({"scale": scale, "items": items, "seconds": seconds, "itemsPerSecond": items / seconds,
+                                  "peakBytes": peak})
+
+            console.log(f"{name} {scale}x: {seconds:.3f}s, {items / seconds:,.0f} items/s, {_megabytes(peak)} MB")
+
+    return results
+
+
+def _megabytes(peak):
+    return "-" if peak is None else f"{peak / 1e6:.1f}"
+
+
+def _exponent(previous, result):
+    """Growth of time with size between two scales: 1 is linear, 2 quadratic"""
+
+    if not previous or previous["seconds"] <= 0:
+        return None
+
+    return math.log(result["seconds"] / previous["seconds"]) / math.log(result["items"] / previous["items"])
+
+
+def print_results(results, baseline=None):
+    table = Table(show_header=True, header_style="bold", min_width=100)
+
+    table.add_column("Function", no_wrap=True)
+    for col in ("Scale", "Items", "Time (s)", "Items/s", "Peak MB", "Growth"):
+        table.add_column(col, justify="right")
+
+    if baseline:
+        table.add_column(f"Time vs. {baseline.get('commit')}", justify="right")
+
+    for name, runs in results.items():
+        previous = None
+        baseRuns = {run["scale"]: run for run in (baseline or {}).get("results", {}).get(name, [])}
+
+        for run in runs:
+            exponent = _exponent(previous, run)
+            growth = "-" if exponent is None else f"n^{exponent:.2f}"
+            growth = f"[red]{growth}[/red]" if exponent is not None and exponent > SUPERLINEAR else growth
+
+            row = [name, f"{run['scale']}x", str(run["items"]), f"{run['seconds']:.4f}",
+                   f"{run['itemsPerSecond']:,.0f}", _megabytes(run["peakBytes"]), growth]
+
+            if baseline:
+                baseRun = baseRuns.get(run["scale"])
+                row.append(f"{run['seconds'] / baseRun['seconds']:.2f}x" if baseRun else "-")
+
+            table.add_row(*row)
+            previous = run
+
+        table.add_section()
+
+    console.print(table)
+    console.print(f"[red]n^x[/red]: time grows faster than n^{SUPERLINEAR} with the number of issues")
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description='Scaling benchmarks of the issue parsing and aggregation hot paths')
+
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 10, 100],
+                        help='Multiples of the base PI size to run (default: 1 10 100)')
+    parser.add_argument('--issues', type=int, default=20,
+                        help='Number of issues of the base PI (default: 20)')
+    parser.add_argument('--depth', type=int, default=8,
+                        help='Number of changelog histories per issue (default: 8)')
+    parser.add_argument('--disciplines', type=int, default=3,
+                        help='Number of disciplines, up to 4 (default: 3)')
+    parser.add_argument('--epics', type=int, default=4,
+                        help='Number of epics of the base PI (default: 4)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Number of timed runs of each function, the best is kept (default: 3)')
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS),
+                        help='Functions to benchmark (default: all)')
+    parser.add_argument('--output', metavar='FILE',
+                        help='Results file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='Results file of a previous run to compare with')
+
+    return parser.parse_args()
+
+
+def main():
+    args = get_args()
+    commit = get_commit()
+
+    results = run_benchmarks(args.only, sorted(args.scales), args.issues, args.depth, args.disciplines,
+                             args.epics, args.repeat)
+
+    baseline = None
+
+    if args.compare:
+        with open(args.compare, "r") as fi:
+            baseline = json.load(fi)
+
+    print_results(results, baseline)
+
+    output = args.output or os.path.join(BASE_DIR, "results", f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    with open(output, "w") as fo:
+        json.dump({"commit"    : commit,
+                   "date"      : datetime.now().isoformat(),
+                   "python"    : sys.version.split()[0],
+                   "parameters": {"issues": args.issues, "depth": args.depth, "disciplines": args.disciplines,
+                                  "epics": args.epics, "repeat": args.repeat},
+                   "results"   : results}, fo, indent=2)
+
+    console.log(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
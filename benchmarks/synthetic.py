@@ -0,0 +1,128 @@
+import random
+from datetime import datetime, timedelta, timezone
+
+TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.000+0000"
+
+# status ids (see STATUS_MAP in utils/issue_parsing.py) in workflow order
+WORKFLOW = [("10561", "Backlog"), ("12661", "Iteration Ready"), ("11966", "In Development"),
+            ("12161", "In Code Review"), ("10044", "In QA"), ("11967", "In Acceptance"), ("10011", "Accepted")]
+DISCIPLINES = ["Server", "Web", "Qa/Automation", "PO/PM"]
+
+
+def get_iterations(pi=27, nIterations=5):
+    return [f"AO-PI{pi}-IT{n}" for n in range(1, nIterations + 1)]
+
+
+def _status_changes(rng, depth):
+    """depth status transitions through the workflow, reworking (QA back to development) once at QA"""
+
+    changes = list()
+    position = 0
+
+    while len(changes) < depth:
+        if WORKFLOW[position][1] == "In QA" and len(changes) < depth - 3 and rng.random() < 0.5:
+            target = WORKFLOW.index(("11966", "In Development"))
+        elif position + 1 < len(WORKFLOW):
+            target = position + 1
+        else:
+            break
+
+        changes.append(("status", *WORKFLOW[position], *WORKFLOW[target]))
+        position = target
+
+    return changes, WORKFLOW[position]
+
+
+def generate_issue(rng, key, epicKey, iterations, depth, disciplines, teamName, start):
+    """A raw Jira story (as returned by the search endpoint with expand=changelog)"""
+
+    changes, status = _status_changes(rng, depth)
+    iteration = rng.randrange(len(iterations))
+    sprints = [iterations[iteration]]
+
+    # the remaining depth is made of flags and sprint changes
+    while len(changes) < depth:
+        if iteration + 1 < len(iterations) and rng.random() < 0.3:
+            iteration += 1
+            changes.append(("Sprint", "1", ", ".join(sprints), "1, 2", ", ".join(sprints + [iterations[iteration]])))
+            sprints.append(iterations[iteration])
+        else:
+            changes.append(("Flagged", None, None, "10000", "Impediment"))
+            changes.append(("Flagged", "10000", "Impediment", None, None))
+
+    created = start
+    histories = list()
+
+    for n, (field, fromId, fromString, toId, toString) in enumerate(changes[:depth]):
+        created += timedelta(hours=rng.randint(2, 72))
+        histories.append({
+            "id"     : f"{key}-{n}",
+            "created": created.strftime(TIME_FORMAT),
+            "items"  : [{"field": field, "from": fromId, "fromString": fromString, "to": toId, "toString": toString}]
+        })
+
+    labels = rng.sample(disciplines, rng.randint(1, min(2, len(disciplines))))
+    done = status[1] == "Accepted"
+
+    return {
+        "key"      : key,
+        "fields"   : {
+            "summary"          : f"Story {key}",
+            "issuetype"        : {"name": rng.choice(["Story", "Defect"])},
+            "status"           : {"name": status[1]},
+            "labels"           : labels,
+            "components"       : [],
+            "assignee"         : {"displayName": f"Assignee {rng.randrange(8)}"},
+            "customfield_15500": {"value": teamName},
+            "customfield_11000": epicKey,
+            "customfield_10501": rng.choice([1, 2, 3, 5, 8]),
+            "customfield_20501": rng.choice([0, 1, 2, 3]),
+            "customfield_20500": rng.choice([0, 1, 2, 3]),
+            "customfield_20502": rng.choice([0, 1, 2]),
+            "customfield_10007": sprints,
+            "resolution"       : {"name": "Done"} if done else None,
+            "resolutiondate"   : histories[-1]["created"] if done and histories else None,
+            "created"          : start.strftime(TIME_FORMAT),
+        },
+        "changelog": {"startAt": 0, "maxResults": len(histories), "total": len(histories), "histories": histories}
+    }
+
+
+def generate_epic(key, teamName, start):
+    return {
+        "key"   : key,
+        "fields": {
+            "summary"          : f"Epic {key}",
+            "issuetype"        : {"name": "Epic"},
+            "status"           : {"name": "Implementing"},
+            "labels"           : ["Server"],
+            "customfield_15500": {"value": teamName},
+            "resolution"       : None,
+            "created"          : start.strftime(TIME_FORMAT),
+        }
+    }
+
+
+def generate_pi(nIssues=250, changelogDepth=8, nDisciplines=3, nEpics=25, teamName="Crewmates", seed=0):
+    """A synthetic PI: (epics, issues, iterations), with issues spread over the epics and iterations
+
+    nDisciplines is capped to the disciplines issue parsing recognises. nEpics should not exceed nIssues, as
+    the overview can't order epics without issues
+    """
+
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 8, 9, tzinfo=timezone.utc)
+    iterations = get_iterations()
+    disciplines = DISCIPLINES[:max(1, min(nDisciplines, len(DISCIPLINES)))]
+
+    epics = [generate_epic(f"AO-{n + 1}", teamName, start) for n in range(nEpics)]
+
+    # every epic has at least one issue (if there are enough issues)
+    epicKeys = [epics[n]["key"] if n < nEpics else rng.choice(epics)["key"] for n in range(nIssues)] \
+        if epics else [None] * nIssues
+
+    issues = [generate_issue(rng, f"AO-{nEpics + n + 1}", epicKey, iterations, changelogDepth, disciplines, teamName,
+                             start + timedelta(days=rng.randrange(60)))
+              for n, epicKey in enumerate(epicKeys)]
+
+    return epics, issues, iterations
@@ -0,0 +1,192 @@
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+import numpy as np
+from matplotlib.figure import Figure
+from rich.console import Console
+
+from utils.jira_jql import get_sprint_queries, iter_jira_pages
+
+
+@dataclass
+class DataContainer:
+    """Class for storing required data"""
+
+    jiraConf: dict = field(default_factory=dict)
+    piReportConf: dict = field(default_factory=dict)
+    outputDir: str = str()
+    doneStatuses: tuple = ("accepted", "completed", "done")
+    # workflow order, used to stack the cumulative flow diagram. Unknown statuses are added above
+    statusOrder: tuple = ("Backlog", "To Do", "Iteration Ready", "Analysis In Progress", "Analysis Done",
+                          "Pending", "Awaiting Internal", "In Development", "In Code Review", "In QA",
+                          "In Acceptance", "Accepted", "Completed", "Done")
+
+
+dc = DataContainer()
+console = Console()
+
+
+def _to_datetime64(timestamps):
+    """Converts jira timestamps (2024-02-01T10:00:00.000+0000) to UTC datetime64"""
+
+    timestamps = np.asarray(timestamps, dtype="<U28")
+    local = timestamps.astype("<U23").astype("datetime64[ms]")
+    offsets = np.array([(-1 if t[23] == "-" else 1) * (int(t[24:26]) * 60 + int(t[26:28])) for t in timestamps],
+                       dtype="timedelta64[m]")
+
+    return local - offsets
+
+
+def get_status_events(issues):
+    """Flattens the status changelog of every issue into event columns
+
+    Returns (timestamps, statuses, deltas) for status counts and (timestamps, points) for completed points
+    and scope. An issue entering a status is +1 for that status and -1 for the status it leaves.
+    """
+
+    times, statuses, deltas = list(), list(), list()
+    pointTimes, points = list(), list()
+    scopeTimes, scope = list(), list()
+
+    for issue in issues:
+        fields_ = issue.get("fields", {})
+        created = fields_.get("created")
+        sp = fields_.get("customfield_10501") or 0
+
+        transitions = sorted(
+                ((history.get("created"), item.get("fromString"), item.get("toString"))
+                 for history in (issue.get("changelog") or {}).get("histories", [])
+                 for item in history.get("items", []) if item.get("field") == "status"),
+                key=lambda transition: transition[0])
+
+        initial = transitions[0][1] if transitions else (fields_.get("status") or {}).get("name")
+
+        times.append(created)
+        statuses.append(initial)
+        deltas.append(1)
+
+        scopeTimes.append(created)
+        scope.append(sp)
+
+        if initial and initial.lower() in dc.doneStatuses:
+            pointTimes.append(created)
+            points.append(sp)
+
+        for timestamp, from_, to in transitions:
+            times += [timestamp, timestamp]
+            statuses += [from_, to]
+            deltas += [-1, 1]
+
+            wasDone = bool(from_) and from_.lower() in dc.doneStatuses
+            isDone = bool(to) and to.lower() in dc.doneStatuses
+
+            if wasDone != isDone:
+                pointTimes.append(timestamp)
+                points.append(sp if isDone else -sp)
+
+    return ((_to_datetime64(times), np.array(statuses, dtype=object), np.array(deltas, dtype=np.int64)),
+            (_to_datetime64(pointTimes), np.array(points, dtype=np.float64)),
+            (_to_datetime64(scopeTimes), np.array(scope, dtype=np.float64)))
+
+
+def _sweep(times, values, days, columns=None, nColumns=1):
+    """Accumulates values per day (events before the first day count towards it) and sums over time"""
+
+    index = np.clip((times - days[0]).astype("timedelta64[D]").astype(np.int64), 0, None)
+    keep = index < len(days)
+    grid = np.zeros((len(days), nColumns), dtype=values.dtype)
+
+    np.add.at(grid, (index[keep], columns[keep] if columns is not None else 0), values[keep])
+
+    return np.cumsum(grid, axis=0)
+
+
+def compute_flow(issues, start=None, end=None):
+    """Computes daily counts per status and completed/total story points with a single sweep per series
+
+    Returns (days, statuses, counts[day, status], completed[day], scope[day])
+    """
+
+    (times, statuses, deltas), (pointTimes, points), (scopeTimes, scope) = get_status_events(issues)
+
+    start = np.datetime64(start, "D") if start else times.min().astype("datetime64[D]")
+    end = np.datetime64(end, "D") if end else np.datetime64(datetime.now().date(), "D")
+    days = np.arange(start, end + 1, dtype="datetime64[D]")
+
+    # map statuses to columns, in workflow order
+    known = [status for status in dc.statusOrder if status in set(statuses)]
+    names = known + sorted(set(statuses) - set(known) - {None})
+    lookup = {status: n for n, status in enumerate(names)}
+    columns = np.array([lookup.get(status, -1) for status in statuses], dtype=np.int64)
+    valid = columns >= 0
+
+    counts = _sweep(times[valid], deltas[valid], days, columns[valid], len(names))
+    completed = _sweep(pointTimes, points, days)[:, 0]
+    total = _sweep(scopeTimes, scope, days)[:, 0]
+
+    return days, names, counts, completed, total
+
+
+def plot_cumulative_flow(days, names, counts, filepath):
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+
+    # done statuses at the bottom
+    order = sorted(range(len(names)), key=lambda n: names[n].lower() not in dc.doneStatuses)
+    ax.stackplot(days.astype(datetime), *[counts[:, n] for n in order], labels=[names[n] for n in order])
+
+    ax.set_title(f"Cumulative Flow - {dc.piReportConf.get('pi')}")
+    ax.set_ylabel("Issues")
+    ax.legend(loc="upper left", fontsize="small")
+    fig.autofmt_xdate()
+    fig.savefig(filepath)
+
+
+def plot_burn_up(days, completed, total, filepath):
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+
+    ax.plot(days.astype(datetime), total, label="Scope")
+    ax.plot(days.astype(datetime), completed, label="Completed")
+
+    ax.set_title(f"Burn-up - {dc.piReportConf.get('pi')}")
+    ax.set_ylabel("Story Points")
+    ax.legend(loc="upper left")
+    fig.autofmt_xdate()
+    fig.savefig(filepath)
+
+
+def get_flow_report(jiraConf, piReportConf, start=None, end=None):
+    dc.jiraConf = jiraConf
+    dc.piReportConf = piReportConf
+    dc.outputDir = dc.piReportConf.get("statsOutputDir")
+
+    jql = (f'"Team Name" = "{dc.jiraConf.get("teamName")}"'
+           + ' AND issuetype in (Story, Defect)'
+           + ' AND status != Canceled'
+           )
+
+    queries = get_sprint_queries(dc.jiraConf, dc.piReportConf.get("iterations"), jql)
+    issues = [issue for page in iter_jira_pages(dc.jiraConf, queries, expand="changelog") for issue in page]
+
+    if not issues:
+        console.log("No issues found", style="bold yellow")
+        return
+
+    console.log(f"Computing flow for {len(issues)} issues...")
+
+    startTime = time.perf_counter()
+    days, names, counts, completed, total = compute_flow(issues, start, end)
+    console.log(f"Computed {len(days)} days x {len(names)} statuses in {time.perf_counter() - startTime:.3f}s")
+
+    if not os.path.isdir(dc.outputDir):
+        os.makedirs(dc.outputDir)
+
+    baseName = os.path.join(dc.outputDir, dc.piReportConf.get("statsFileName"))
+
+    plot_cumulative_flow(days, names, counts, baseName + "-cfd.png")
+    plot_burn_up(days, completed, total, baseName + "-burnup.png")
+
+    console.log(f"Charts written to {baseName}-cfd.png and {baseName}-burnup.png")
@@ -0,0 +1,173 @@
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from rich.console import Console
+from rich.markdown import Markdown
+from rich.table import Table
+
+from pi_overview import collect_pi_metrics, is_done
+
+
+@dataclass
+class DataContainer:
+    """Class for storing required data"""
+
+    iterations: list = field(default_factory=list)
+    capacity: dict = field(default_factory=dict)
+    iterationLength: int = 10
+    trials: int = 100000
+    percentiles: tuple = (50, 85, 95)
+    seed: int = None
+
+
+dc = DataContainer()
+console = Console()
+
+
+def get_throughput_samples(metrics):
+    """Completed story points of each elapsed iteration, and the index of the iteration in progress
+
+    Throughput is counted in story points, as the remaining load is. The latest iteration with completed work
+    is taken to be in progress, so only the iterations before it are sampled, falling back on capacity
+    """
+
+    completed = np.zeros(len(dc.iterations), dtype=float)
+
+    for epic in metrics.get("epics").values():
+        for child in epic.get("children").values():
+            if is_done(child) and child.get("iteration") in dc.iterations:
+                completed[dc.iterations.index(child.get("iteration"))] += child.get("spEstimate")
+
+    started = np.flatnonzero(completed > 0)
+    current = int(started[-1]) if len(started) else 0
+
+    if current:
+        return completed[:current], current
+
+    capacity = np.sum(np.array(list(dc.capacity.values()), dtype=float), axis=0)
+
+    return capacity, current
+
+
+def get_remaining_load(metrics):
+    """Remaining story points of each epic, in the order the epics are planned"""
+
+    epics = sorted(metrics.get("epics").items(), key=lambda x: max(x[1].get("iters", []), default=0))
+    remaining = [(key, sum(child.get("spEstimate") for child in epic.get("children").values()
+                           if not is_done(child)))
+                 for key, epic in epics]
+
+    return [(key, load) for key, load in remaining if load > 0]
+
+
+def get_remaining_stories(metrics, remaining):
+    """Number of issues left to complete in each of the remaining epics"""
+
+    return [sum(1 for child in metrics.get("epics").get(key).get("children").values() if not is_done(child))
+            for key, _ in remaining]
+
+
+def get_cycle_times(metrics):
+    """Cycle times (business days) of completed issues"""
+
+    return np.array([child.get("cycleTime") for epic in metrics.get("epics").values()
+                     for child in epic.get("children").values() if child.get("cycleTime", 0) > 0], dtype=float)
+
+
+def simulate(throughput, targets, stories, cycleTimes, horizon, trials, rng):
+    """Monte Carlo simulation of the iteration (index from the first forecast iteration) in which the
+    cumulative targets are completed
+
+    Each trial draws the throughput of every future iteration from the historical samples. As throughput is
+    counted when work is accepted, a target is completed in the first iteration where the cumulative throughput
+    covers it, unless its remaining stories can't be done by then: counting from the first forecast iteration
+    (conservatively for stories already in progress), the last of them is completed no earlier than the longest
+    of their resampled cycle times (in iterations). Iterations beyond the horizon are capped.
+    """
+
+    cumulative = np.cumsum(rng.choice(throughput, size=(trials, horizon)), axis=1)
+
+    completion = np.empty((trials, len(targets)), dtype=np.int64)
+
+    for n, target in enumerate(targets):
+        reached = cumulative >= target
+        completion[:, n] = np.where(reached.any(axis=1), reached.argmax(axis=1), horizon)
+
+    if len(cycleTimes):
+        # the longest of n cycle times, drawn from its distribution: the quantile u ** (1 / n) of the samples
+        quantiles = rng.random(size=completion.shape) ** (1 / np.maximum(np.asarray(stories, dtype=float), 1))
+        longest = np.quantile(cycleTimes, quantiles, method="inverted_cdf")
+
+        completion = np.maximum(completion, (longest // dc.iterationLength).astype(np.int64))
+
+    return np.minimum(completion, horizon)
+
+
+def _iteration_label(index, start):
+    """Names the n-th forecast iteration"""
+
+    iteration = start + index
+
+    if iteration < len(dc.iterations):
+        return dc.iterations[iteration]
+
+    return f"+{iteration - len(dc.iterations) + 1} after PI"
+
+
+def print_forecast(remaining, completion, start, horizon):
+    table = Table(show_header=True, header_style="bold", min_width=100)
+
+    table.add_column("Feature")
+    table.add_column("Remaining", justify="right")
+    for percentile in dc.percentiles:
+        table.add_column(f"P{percentile}", justify="right")
+
+    quantiles = np.percentile(completion, dc.percentiles, axis=0, method="higher").T
+
+    rows = [*[(key, load) for key, load in remaining], ("[b]PI (all features)", sum(load for _, load in remaining))]
+
+    for (key, load), quantile in zip(rows, quantiles):
+        labels = [_iteration_label(q, start) if q < horizon else f"> {_iteration_label(horizon - 1, start)}"
+                  for q in quantile]
+        table.add_row(key, str(load), *labels)
+
+    console.print(table)
+
+
+def get_pi_forecast(jiraConf, reportConf, trials=None):
+    dc.iterations = reportConf.get("iterations")
+    dc.capacity = reportConf.get("capacity")
+    dc.iterationLength = reportConf.get("iterationLength", dc.iterationLength)
+    dc.trials = trials or dc.trials
+
+    metrics = collect_pi_metrics(jiraConf, reportConf, expand="changelog")
+
+    throughput, start = get_throughput_samples(metrics)
+    remaining = get_remaining_load(metrics)
+    cycleTimes = get_cycle_times(metrics)
+
+    if not remaining:
+        console.log("No remaining load to forecast", style="bold yellow")
+        return
+
+    # the PI's remaining iterations and another PI
+    horizon = len(dc.iterations) - start + len(dc.iterations)
+
+    # features are completed in order, the last target is the whole PI
+    targets = np.cumsum([load for _, load in remaining])
+    targets = np.append(targets, targets[-1])
+    stories = get_remaining_stories(metrics, remaining)
+    stories.append(sum(stories))
+
+    startTime = time.perf_counter()
+    completion = simulate(throughput, targets, stories, cycleTimes, horizon, dc.trials,
+                          np.random.default_rng(dc.seed))
+    duration = time.perf_counter() - startTime
+
+    console.print(Markdown(
+            "# PI Forecast - Iteration in which each feature is completed (Monte Carlo)"), style="bold blue")
+    print_forecast(remaining, completion, start, horizon)
+
+    console.print(f"{dc.trials} trials in {duration:.2f}s, sampling {len(throughput)} iteration throughputs"
+                  + f" ({', '.join(f'{t:g}' for t in throughput)} SP) and {len(cycleTimes)} cycle times")
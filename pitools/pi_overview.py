@@ -1,7 +1,10 @@
+import io
 import os
+import sys
 from copy import deepcopy
 from dataclasses import dataclass, field
 from datetime import datetime
+from threading import current_thread, main_thread
 
 import jmespath as jp
 import numpy as np
@@ -10,8 +13,13 @@ from rich.markdown import Markdown
 from rich.progress import BarColumn, Progress, TimeRemainingColumn
 from rich.table import Table
 
-from utils.issue_parsing import extract_issue_info
-from utils.jira_jql import run_jira_jql
+from utils.history_index import HistoryIndex
+from utils.issue_parsing import extract_issues_info
+from utils.issue_table import write_issue_table
+from utils.jira_jql import get_sprint_queries, iter_jira_pages, run_jira_jql, run_jira_jqls
+from utils.report_formats import EXTENSIONS, format_report, iter_issues
+from utils.scoped import ScopedContainer
+from utils.warning_rules import compile_rules
 
 
 @dataclass
@@ -22,6 +30,12 @@ class DataContainer:
     capacity: dict = field(default_factory=dict)
     iterations: list = field(default_factory=list)
     progIncrement: str = str()
+    epicChunkSize: int = 50
+    warningRules: tuple = tuple()
+    asOf: datetime = None
+    historyIndex: HistoryIndex = field(default_factory=HistoryIndex)
+    lintFields: tuple = ("issuetype", "resolution", "status", "customfield_10007", "customfield_11000",
+                         "customfield_15500")
     defaultEpic: dict = field(default_factory=lambda: dict(iters=set(), children=dict(), status=str()))
     metrics: dict = field(default_factory=lambda: dict(epics=dict(), loadByDiscipline=dict(), loadByAssignee=dict(),
                                                        loadOverview=dict(), velocityByDiscipline=dict(),
@@ -29,6 +43,7 @@ class DataContainer:
                           )
     showAssignee: bool = bool()
     writeLogs: bool = bool()
+    console: Console = field(default_factory=Console)
     statusColorMap: dict = field(default_factory=lambda: {
         "accepted"      : "green",
         "completed"     : "green",
@@ -42,24 +57,31 @@ class DataContainer:
     })
 
 
-dc = DataContainer()
-console = Console(record=True)
+# state of the current report, see utils/scoped.py
+dc = ScopedContainer(DataContainer)
 
 
-def get_pi_features():
+def _as_of(issues):
+    """Reconstructs issues as they were at dc.asOf (if set), dropping those not created yet"""
+
+    if not dc.asOf:
+        return issues
+
+    return [issue for issue in (dc.historyIndex.issue_at(issue, dc.asOf) for issue in issues) if issue]
+
+
+def get_pi_features(expand=None):
     """Gets all features that are scheduled in the specified PI in config"""
 
     query = (f"project = '{dc.jiraConf.get('project')}'"
              + f" AND 'PI Number' ~ '{dc.progIncrement}'"
-             + " AND 'Team Name' = Crewmates"
+             + f" AND 'Team Name' = '{dc.jiraConf.get('teamName')}'"
              + " AND issuetype = 'Epic'"
              + " AND status != Canceled"
              )
-    features = run_jira_jql(dc.jiraConf, query)
-
-    for feature in features:
+    features = _as_of(run_jira_jql(dc.jiraConf, query, expand=expand))
 
-        info = extract_issue_info(dc.jiraConf, feature)
+    for info in extract_issues_info(dc.jiraConf, features, dc.warningRules):
 
         key = info.get("key")
         dc.metrics["epics"][key] = deepcopy(dc.defaultEpic) | info
@@ -68,37 +90,99 @@ def get_pi_features():
             dc.metrics["warnings"][key] = {"warnings": warnings, **info}
 
 
-def get_issues():
-    """Gets all issues for sprints specified in config"""
-    epicLinks = ",".join(list(dc.metrics.get("epics").keys()))
-    sprints = ",".join(dc.iterations)
-    subQuery = (f"Sprint in ({sprints})"
-                + " AND 'Team Name' = Crewmates"
+def _get_issue_queries(epicKeys, clause=""):
+    """Splits the issue query into epic link chunks and per sprint queries, each restricted by clause"""
+
+    subQuery = (f"'Team Name' = '{dc.jiraConf.get('teamName')}'"
                 + " AND issuetype not in ('Epic', 'Sub-task')"
+                + " AND status != Canceled"
+                + clause
                 )
 
-    query = (f"('Epic Link' in ({epicLinks}) OR {subQuery})"
-             + " AND status != Canceled"
-             )
+    chunks = [epicKeys[i:i + dc.epicChunkSize] for i in range(0, len(epicKeys), dc.epicChunkSize)]
+    queries = [f"'Epic Link' in ({','.join(chunk)}) AND status != Canceled{clause}" for chunk in chunks]
 
-    issues = run_jira_jql(dc.jiraConf, query)
+    return queries + get_sprint_queries(dc.jiraConf, dc.iterations, subQuery)
 
-    for issue in issues:
-        info = extract_issue_info(dc.jiraConf, issue)
-        dc.metrics["epics"].setdefault(info.get("epicKey"), deepcopy(dc.defaultEpic)) \
-            .get("iters") \
-            .add(info.get("iterNo"))
-        dc.metrics["epics"][info.get("epicKey")]["children"].update({info.get("key"): info})
 
-        if warnings := info.get("warnings"):
-            dc.metrics["warnings"][info.get("key")] = {"warnings": warnings, **info}
+def get_issues(expand=None, onPage=None):
+    """Gets all issues for sprints specified in config
+
+    onPage, if given, is called with each page of issues and their parsed info, so they can be reused
+    """
+
+    queries = _get_issue_queries(list(dc.metrics.get("epics").keys()))
+
+    # each page is parsed while the following pages are retrieved
+    for issues in iter_jira_pages(dc.jiraConf, queries, expand=expand):
+        issues = _as_of(issues)
+        infos = extract_issues_info(dc.jiraConf, issues, dc.warningRules)
+
+        if onPage:
+            onPage(issues, infos)
+
+        for info in infos:
+            dc.metrics["epics"].setdefault(info.get("epicKey"), deepcopy(dc.defaultEpic)) \
+                .get("iters") \
+                .add(info.get("iterNo"))
+            dc.metrics["epics"][info.get("epicKey")]["children"].update({info.get("key"): info})
+
+            if warnings := info.get("warnings"):
+                dc.metrics["warnings"][info.get("key")] = {"warnings": warnings, **info}
+
+
+def get_lint_issues():
+    """Gets only the issues which may have warnings
+
+    If every rule has a jql predicate, the rules are pushed down into the issue queries. Otherwise a single pass
+    evaluates all the rules locally over the unresolved issues, retrieving only the fields they need (querying
+    the pushed rules' issues separately would only retrieve a subset of these).
+    """
+
+    epicKeys = list(dc.metrics.get("epics").keys())
+    unresolved = " AND resolution is EMPTY"
+
+    pushed = tuple(rule for rule in dc.warningRules if rule.jql)
+    residual = tuple(rule for rule in dc.warningRules if not rule.jql)
+    fetched = dict(pushed=0, residual=0)
+
+    results = list()
+
+    if pushed and not residual:
+        clause = unresolved + " AND (" + " OR ".join(rule.jql for rule in pushed) + ")"
+        issues = run_jira_jqls(dc.jiraConf, _get_issue_queries(epicKeys, clause))
+        fetched["pushed"] = len(issues)
+        results.append(extract_issues_info(dc.jiraConf, issues, pushed))
+
+    elif residual:
+        if all(rule.fields for rule in dc.warningRules):
+            fields = ",".join(sorted({*dc.lintFields,
+                                      *[field_ for rule in dc.warningRules for field_ in rule.fields]}))
+        else:
+            fields = "*all"
+
+        issues = run_jira_jqls(dc.jiraConf, _get_issue_queries(epicKeys, unresolved), fields=fields)
+        fetched["residual"] = len(issues)
+        results.append(extract_issues_info(dc.jiraConf, issues, dc.warningRules))
+
+    for infos in results:
+        for info in infos:
+            if warnings := info.get("warnings"):
+                dc.metrics["warnings"].setdefault(info.get("key"), {**info, "warnings": list()})
+                dc.metrics["warnings"][info.get("key")]["warnings"].extend(warnings)
+
+    return fetched
+
+
+def is_done(issue):
+    return issue.get("status").lower() in ("accepted", "completed", "done")
 
 
 def _extract_discipline_metrics(issue):
     spEstimate = issue.get("spEstimate")
     disciplines = issue.get("discipline")
     iteration = issue.get("iteration")
-    done = issue.get("status").lower() in ("accepted", "completed", "done")
+    done = is_done(issue)
     planned = iteration != "NA"
 
     disciplineMap = {
@@ -180,7 +264,8 @@ def get_metrics():
                       TimeRemainingColumn()
                       )
 
-    with Progress(*progressParams) as progress:
+    with Progress(*progressParams, console=Console(stderr=True),
+                  disable=current_thread() is not main_thread()) as progress:
         # create task for progress bar
         task1 = progress.add_task(
                 "Processing Features/Issues", total=len(dc.metrics.get("epics")))
@@ -216,7 +301,7 @@ def print_epic_distribution(res):
 
     # add rows
     rowNo = 0
-    for k, v in sorted(res.items(), key=lambda x: max(x[1].get("iters", []))):
+    for k, v in sorted(res.items(), key=lambda x: max(x[1].get("iters", []), default=0)):
         # TODO: fix this mess: use jmespath?
         children = {iteration: "\n".join(
                 [get_styling(i, j) for i, j in v.get("children").items() if j.get("iteration") == iteration]) for
@@ -233,8 +318,8 @@ def print_epic_distribution(res):
               + " Run script with -w option to see warnings[/red] \n"
               + "*Story is not belonging to the current team"
               )
-    console.print(table)
-    console.print(footer)
+    dc.console.print(table)
+    dc.console.print(footer)
 
 
 def print_load_overview(res):
@@ -279,7 +364,7 @@ def print_load_overview(res):
                 k, 0) - v.get("completed")), str(capTotals.get(k, 0) - v.get("remaining")), "-")
         table.add_row()
 
-    console.print(table)
+    dc.console.print(table)
 
 
 def print_load_metrics(res):
@@ -334,7 +419,7 @@ def print_load_metrics(res):
                 "Delta", *[str(i) if i >= 0 else errStyle + str(i) for i in delta], style="bold")
         table.add_row()
 
-    console.print(table)
+    dc.console.print(table)
 
 
 def print_velocity_metrics(res):
@@ -369,7 +454,7 @@ def print_velocity_metrics(res):
         table.add_row("Completed", *[str(i) for i in load])
         table.add_row()
 
-    console.print(table)
+    dc.console.print(table)
 
 
 def print_warnings(res):
@@ -393,65 +478,173 @@ def print_warnings(res):
                 v.get("link")
         )
 
-    console.print(table)
-
-
-def get_pi_overview(jiraConf, reportConf, showWarnings=False, showAssignee=False, outputLog=False):
-    dc.jiraConf = jiraConf
-    dc.capacity = reportConf.get("capacity")
-    dc.progIncrement = reportConf.get("pi")
-    dc.iterations = reportConf.get("iterations")
-
-    # get features in PI
-    get_pi_features()
+    dc.console.print(table)
 
-    # Get issues from Jira
-    get_issues()
 
-    # Extract relevant metrics
-    get_metrics()
+def print_pi_overview(showWarnings=False, showAssignee=False):
+    """Prints all PI overview tables to the console"""
 
-    # Print results to console
     # Feature Story Distribution
-    console.print(Markdown(
+    dc.console.print(Markdown(
             "# PI Feature Story Distribution - Overview of all features within the PI (includes stories not within the current PI)"),
             style="bold blue")
     print_epic_distribution(dc.metrics["epics"])
 
     # Feature Load Overview
-    console.print(Markdown(
+    dc.console.print(Markdown(
             "# Feature Load Overview (includes stories not within the current PI)"), style="bold blue")
     print_load_overview(dc.metrics["loadOverview"])
 
     # Assignee Load Overview
     if showAssignee:
-        console.print(Markdown("# Iteration Overview By Assignee (Only includes stories assigned to current PI)"),
+        dc.console.print(Markdown("# Iteration Overview By Assignee (Only includes stories assigned to current PI)"),
                       style="bold blue")
         print_load_metrics(dc.metrics["loadByAssignee"])
 
     # Discipline Load Overview
-    console.print(Markdown(
+    dc.console.print(Markdown(
             "# Iteration Load Overview By Discipline (Only includes stories assigned to current PI)"),
             style="bold blue")
     print_load_metrics(dc.metrics["loadByDiscipline"])
 
     # Discipline Velocity Overview
-    console.print(Markdown(
+    dc.console.print(Markdown(
             "# Iteration Velocity Overview By Discipline (Only includes stories assigned to current PI)"),
             style="bold blue")
     print_velocity_metrics(dc.metrics["velocityByDiscipline"])
 
     # Warning Overview
     if showWarnings:
-        console.print(Markdown(
+        dc.console.print(Markdown(
                 "# Issues Warnings. Please double check these issues to ensure metrics are accurate"),
                 style="bold blue")
         print_warnings(dc.metrics["warnings"])
 
+
+def _set_report(jiraConf, reportConf):
+    dc.jiraConf = jiraConf
+    dc.capacity = reportConf.get("capacity")
+    dc.progIncrement = reportConf.get("pi")
+    dc.iterations = reportConf.get("iterations")
+    dc.warningRules = compile_rules(jiraConf, reportConf.get("warningRules"))
+
+
+def _collect_pi_metrics(jiraConf, reportConf, expand=None, asOf=None, onPage=None):
+    dc.asOf = asOf
+    dc.historyIndex = HistoryIndex()
+
+    _set_report(jiraConf, reportConf)
+
+    # get features in PI (their changelog is only needed to reconstruct them)
+    get_pi_features(expand="changelog" if asOf else None)
+
+    # Get issues from Jira
+    get_issues(expand="changelog" if asOf else expand, onPage=onPage)
+
+    # Extract relevant metrics
+    get_metrics()
+
+    return dc.metrics
+
+
+def collect_pi_metrics(jiraConf, reportConf, expand=None, asOf=None):
+    """Retrieves the PI's features and issues and extracts their metrics, without printing them
+
+    With asOf, the features and issues are reconstructed from their changelogs as they were at that time
+    """
+
+    with dc.scope():
+        return _collect_pi_metrics(jiraConf, reportConf, expand=expand, asOf=asOf)
+
+
+def render_pi_overview(jiraConf, reportConf, metrics, outputFormat="html", showWarnings=False, showAssignee=False,
+                       width=160):
+    """Renders collected metrics as html (the rich tables) or as one of the plain / structured formats"""
+
+    console = Console(record=True, file=io.StringIO(), width=width)
+
+    with dc.scope(metrics=metrics, console=console):
+        _set_report(jiraConf, reportConf)
+
+        if outputFormat != "html":
+            return format_report(outputFormat, dc.metrics, dc.iterations, dc.capacity, dc.progIncrement,
+                                 showWarnings=showWarnings, showAssignee=showAssignee)
+
+        print_pi_overview(showWarnings, showAssignee)
+
+        return console.export_html()
+
+
+def _output_pi_overview(showWarnings, showAssignee, outputLog, outputFormat, outputFile):
+    timestamp = datetime.now().isoformat()
+    baseDir = os.path.dirname(__file__)
+    filepath = os.path.join(baseDir, f'logs/log-{timestamp}')
+
+    # Print results to console. Only record the output if it is logged to file
+    if outputFormat == "rich":
+        dc.console.record = outputLog
+
+        print_pi_overview(showWarnings, showAssignee)
+
+        # Log to file
+        if outputLog:
+            dc.console.save_html(filepath + ".html")
+            write_issue_table(list(iter_issues(dc.metrics)), filepath + ".issues")
+
+        return
+
+    # Plain / structured output built directly from the metrics
+    report = format_report(outputFormat, dc.metrics, dc.iterations, dc.capacity, dc.progIncrement,
+                           showWarnings=showWarnings, showAssignee=showAssignee)
+
+    if outputFile:
+        with open(outputFile, "w") as fo:
+            fo.write(report)
+    else:
+        sys.stdout.write(report)
+
     # Log to file
     if outputLog:
-        timestamp = datetime.now().isoformat()
-        baseDir = os.path.dirname(__file__)
-        filepath = os.path.join(baseDir, f'logs/log-{timestamp}')
+        with open(f"{filepath}.{EXTENSIONS[outputFormat]}", "w") as fo:
+            fo.write(report)
+
+        write_issue_table(list(iter_issues(dc.metrics)), filepath + ".issues")
+
+
+def get_pi_overview(jiraConf, reportConf, showWarnings=False, showAssignee=False, outputLog=False,
+                    outputFormat="rich", outputFile=None, asOf=None, expand=None, onPage=None):
+    """Prints / writes the PI overview, returning its metrics
+
+    expand and onPage are passed on to get_issues, so that other reports can reuse the retrieved issues
+    """
+
+    with dc.scope():
+        _collect_pi_metrics(jiraConf, reportConf, expand=expand, asOf=asOf, onPage=onPage)
+
+        _output_pi_overview(showWarnings, showAssignee, outputLog, outputFormat, outputFile)
+
+        return dc.metrics
+
+
+def get_pi_lint(jiraConf, reportConf):
+    """Displays warnings only, retrieving as few issues as possible"""
+
+    with dc.scope():
+        _set_report(jiraConf, reportConf)
+
+        # get features in PI
+        get_pi_features()
+
+        # Get issues with (potential) warnings from Jira
+        fetched = get_lint_issues()
+
+        dc.console.print(Markdown(
+                "# Issues Warnings. Please double check these issues to ensure metrics are accurate"),
+                style="bold blue")
+        print_warnings(dc.metrics["warnings"])
+
+        dc.console.print(f"{len(dc.metrics['warnings'])} issues with warnings"
+                         + f" ({fetched.get('pushed')} issues matched pushed down checks,"
+                         + f" {fetched.get('residual')} issues checked locally)")
 
-        console.save_html(filepath + ".html")
+        return dc.metrics
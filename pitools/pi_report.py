@@ -0,0 +1,41 @@
+from rich.console import Console
+
+from pi_overview import get_pi_overview
+from story_stats import get_story_stats, is_stats_issue
+from utils.issue_parsing import extract_issue_info
+
+console = Console(stderr=True)
+
+
+def get_pi_report(jiraConf, reportConf, showWarnings=False, showAssignee=False, outputLog=False,
+                  outputFormat="rich", outputFile=None, charts=False):
+    """Produces the PI overview and the story stats from a single retrieval of the PI's issues
+
+    The overview's issue queries cover the stats' stories (the team's resolved stories in the PI's sprints),
+    so they are run once with changelog (the features' aren't needed). Each issue is parsed once, and the
+    parsed stories that match the stats query are passed on to the stats instead of being retrieved and parsed
+    again.
+    """
+
+    stats = dict(issues=list(), infos=list())
+
+    def _keep_stats_issues(issues, infos):
+        for issue, info in zip(issues, infos):
+            if is_stats_issue(jiraConf, reportConf, issue):
+                # stories the overview left without status timings are parsed strictly, raising as the stats do
+                if "cycleTime" not in info:
+                    info = extract_issue_info(jiraConf, issue, checkWarnings=False, strict=True) \
+                           | {"warnings": info.get("warnings")}
+
+                stats["issues"].append(issue)
+                stats["infos"].append(info)
+
+    metrics = get_pi_overview(jiraConf, reportConf, showWarnings=showWarnings, showAssignee=showAssignee,
+                              outputLog=outputLog, outputFormat=outputFormat, outputFile=outputFile,
+                              expand="changelog", onPage=_keep_stats_issues)
+
+    console.log(f"{len(stats['issues'])} of the overview's issues used for the story stats")
+
+    rawIssues = get_story_stats(jiraConf, reportConf, charts=charts, issues=stats["issues"], infos=stats["infos"])
+
+    return metrics, rawIssues
@@ -3,13 +3,20 @@ import json
 import os
 import sys
 from dataclasses import dataclass, field
+from datetime import datetime, timezone
 
 import jmespath as jp
 from rich.console import Console
 
-from pi_overview import get_pi_overview
+from pi_flow import get_flow_report
+from pi_forecast import get_pi_forecast
+from pi_overview import get_pi_lint, get_pi_overview
+from pi_report import get_pi_report
+from report_server import serve_reports
 from story_stats import get_story_stats
+from utils.jira_cache import serve_cache
 from utils.jira_jql import check_valid_user
+from utils.report_formats import FORMATS
 
 
 @dataclass
@@ -25,10 +32,23 @@ class DataContainer:
 console = Console(record=True)
 
 
+def _end_of_day(date):
+    """Parses a YYYY-MM-DD date as the end of that day (UTC)"""
+    return datetime.strptime(date, "%Y-%m-%d").replace(hour=23, minute=59, second=59, tzinfo=timezone.utc)
+
+
 def get_args():
     """Gets arguments and flags from command line."""
     parser = argparse.ArgumentParser(description='Program to review iteration workload & PI feature roadmap')
 
+    parser.add_argument(
+            '--record', metavar='DIR',
+            help='Save every raw Jira response to DIR for later replay')
+
+    parser.add_argument(
+            '--replay', metavar='DIR',
+            help='Serve Jira responses from a directory created with --record (no network access)')
+
     subparsers = parser.add_subparsers(dest="cmd")
 
     # PI Overview
@@ -48,11 +68,117 @@ def get_args():
             '--no-logs', action='store_true',
             help='Prevent log file output of the PI overview in the logs folder')
 
-    # Summary stats
+    subparser_pi.add_argument(
+            '--as-of', metavar='YYYY-MM-DD', type=_end_of_day,
+            help='Show the PI as it was at the end of the given day, reconstructed from issue histories')
+
+    subparser_pi.add_argument(
+            '-f', '--format', choices=('rich', *FORMATS), default='rich',
+            help='Output format. Formats other than rich skip table rendering (default: rich)')
+
+    subparser_pi.add_argument(
+            '-o', '--output', metavar='FILE',
+            help='Write the overview to FILE instead of stdout (non-rich formats only)')
+
+    # Cumulative flow / burn-up
+    subparser_flow = subparsers.add_parser(
+            'flow',
+            help='Produce cumulative flow diagram and burn-up chart for the PI')
+
+    subparser_flow.add_argument(
+            '--start', metavar='YYYY-MM-DD',
+            help='First day of the charts (default: first issue creation)')
+
+    subparser_flow.add_argument(
+            '--end', metavar='YYYY-MM-DD',
+            help='Last day of the charts (default: today)')
+
+    # Forecast
+    subparser_forecast = subparsers.add_parser(
+            'forecast',
+            help='Forecast the iteration in which each feature is completed')
+
+    subparser_forecast.add_argument(
+            '-n', '--trials', type=int, default=100000,
+            help='Number of Monte Carlo trials (default: 100000)')
+
+    # Lint
     subparsers.add_parser(
+            'lint',
+            help='Display issues with warnings, checked in the Jira query where possible')
+
+    # Summary stats
+    subparser_stats = subparsers.add_parser(
             'stats',
             help='Produce summary statistic report for stories')
 
+    subparser_stats.add_argument(
+            '-c', '--charts', action='store_true',
+            help='Also render time in status and cycle time charts per discipline and iteration')
+
+    # Combined reports
+    subparser_report = subparsers.add_parser(
+            'report',
+            help='Produce several reports from a single retrieval of the PI\'s issues')
+
+    subparser_report.add_argument(
+            '--all', action='store_true', required=True,
+            help='Produce the PI overview and the summary stats')
+
+    subparser_report.add_argument(
+            '-a', '--assignee', action='store_true',
+            help='Include jira assignees breakdown in PI Overview')
+
+    subparser_report.add_argument(
+            '-w', '--warnings', action='store_true',
+            help='Display table of issues with warnings')
+
+    subparser_report.add_argument(
+            '--no-logs', action='store_true',
+            help='Prevent log file output of the PI overview in the logs folder')
+
+    subparser_report.add_argument(
+            '-f', '--format', choices=('rich', *FORMATS), default='rich',
+            help='Output format of the PI overview (default: rich)')
+
+    subparser_report.add_argument(
+            '-o', '--output', metavar='FILE',
+            help='Write the PI overview to FILE instead of stdout (non-rich formats only)')
+
+    subparser_report.add_argument(
+            '-c', '--charts', action='store_true',
+            help='Also render time in status and cycle time charts per discipline and iteration')
+
+    # Cache service
+    subparser_cache = subparsers.add_parser(
+            'cache-server',
+            help='Run a local service caching Jira issues, shared by the runs configured with jira.cacheUrl')
+
+    subparser_cache.add_argument(
+            '-p', '--port', type=int, default=8765,
+            help='Port to listen on, on localhost (default: 8765)')
+
+    subparser_cache.add_argument(
+            '--ttl', type=int, default=60,
+            help='Seconds for which cached issues are served without syncing with Jira (default: 60)')
+
+    subparser_cache.add_argument(
+            '--full-refresh', type=int, default=3600,
+            help='Seconds between full re-fetches of cached queries, instead of incremental syncs (default: 3600)')
+
+    # Report server
+    subparser_serve = subparsers.add_parser(
+            'serve',
+            help='Serve the PI overview (html, json, csv, markdown) of the configured team / PI reports over HTTP')
+
+    subparser_serve.add_argument(
+            '-p', '--port', type=int, default=8080,
+            help='Port to listen on, on localhost (default: 8080)')
+
+    subparser_serve.add_argument(
+            '--ttl', type=int, default=300,
+            help='Seconds for which the metrics of a report are served before being collected again (default: 300)')
+
     args = parser.parse_args()
 
     if len(sys.argv) == 1:
@@ -72,8 +198,10 @@ def get_config():
 
 
 def main():
+    dc.jiraConf |= {"recordDir": dc.args.record, "replayDir": dc.args.replay}
+
     # Check user credentials are valid
-    if not check_valid_user(dc.jiraConf):
+    if not dc.args.replay and not check_valid_user(dc.jiraConf):
         return
 
     if dc.args.cmd == "overview":
@@ -82,11 +210,41 @@ def main():
             dc.config,
             showAssignee=dc.args.assignee,
             showWarnings=dc.args.warnings,
-            outputLog=not dc.args.no_logs
+            outputLog=not dc.args.no_logs,
+            outputFormat=dc.args.format,
+            outputFile=dc.args.output,
+            asOf=dc.args.as_of
         )
 
+    if dc.args.cmd == "flow":
+        get_flow_report(dc.jiraConf, dc.config, start=dc.args.start, end=dc.args.end)
+
+    if dc.args.cmd == "forecast":
+        get_pi_forecast(dc.jiraConf, dc.config, trials=dc.args.trials)
+
+    if dc.args.cmd == "lint":
+        get_pi_lint(dc.jiraConf, dc.config)
+
     if dc.args.cmd == "stats":
-        get_story_stats(dc.jiraConf, dc.config)
+        get_story_stats(dc.jiraConf, dc.config, charts=dc.args.charts)
+
+    if dc.args.cmd == "report":
+        get_pi_report(
+            dc.jiraConf,
+            dc.config,
+            showAssignee=dc.args.assignee,
+            showWarnings=dc.args.warnings,
+            outputLog=not dc.args.no_logs,
+            outputFormat=dc.args.format,
+            outputFile=dc.args.output,
+            charts=dc.args.charts
+        )
+
+    if dc.args.cmd == "cache-server":
+        serve_cache(dc.jiraConf, port=dc.args.port, ttl=dc.args.ttl, fullRefresh=dc.args.full_refresh)
+
+    if dc.args.cmd == "serve":
+        serve_reports(dc.jiraConf, dc.config, port=dc.args.port, ttl=dc.args.ttl)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+from urllib.parse import parse_qs, quote, urlparse
+
+from rich.console import Console
+
+from pi_overview import collect_pi_metrics, render_pi_overview
+from utils.report_formats import FORMATS
+
+console = Console(stderr=True)
+
+CONTENT_TYPES = {
+    "html"    : "text/html; charset=utf-8",
+    "json"    : "application/json",
+    "csv"     : "text/csv; charset=utf-8",
+    "markdown": "text/markdown; charset=utf-8",
+}
+
+
+def get_reports(jiraConf, config):
+    """The team / PI reports served: the configured PI, plus any listed under reports in config
+
+    Each report in reports gives its pi, iterations and capacity, and optionally its teamName
+    """
+
+    reports = dict()
+
+    for reportConf in [config, *config.get("reports", [])]:
+        teamName = reportConf.get("teamName", jiraConf.get("teamName"))
+        reports[(teamName, reportConf.get("pi"))] = (jiraConf | {"teamName": teamName}, config | reportConf)
+
+    return reports
+
+
+class ReportCache:
+    """Keeps the metrics of each report warm, re-collecting them from Jira after ttl seconds
+
+    Concurrent requests for the same report wait for a single collection.
+    """
+
+    def __init__(self, reports, ttl=300):
+        self.reports = reports
+        self.ttl = ttl
+        self.metrics = dict()
+        self.inflight = dict()
+        self.lock = Lock()
+
+    def get(self, team, pi):
+        key = (team, pi)
+        jiraConf, reportConf = self.reports[key]
+
+        with self.lock:
+            collected, metrics = self.metrics.get(key, (0.0, None))
+
+            if metrics is not None and time.monotonic() - collected < self.ttl:
+                return jiraConf, reportConf, metrics
+
+            future = self.inflight.get(key)
+            owner = future is None
+
+            if owner:
+                future = self.inflight[key] = Future()
+
+        if not owner:
+            return jiraConf, reportConf, future.result()
+
+        try:
+            start = time.monotonic()
+            metrics = collect_pi_metrics(jiraConf, reportConf)
+            future.set_result(metrics)
+
+            console.log(f"Collected {team} {pi} in {time.monotonic() - start:.2f}s")
+
+        except Exception as ex:
+            future.set_exception(ex)
+            raise ex
+
+        finally:
+            with self.lock:
+                if future.done() and not future.exception():
+                    self.metrics[key] = (start, metrics)
+
+                del self.inflight[key]
+
+        return jiraConf, reportConf, metrics
+
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+
+    def _send(self, status, body, contentType="text/plain; charset=utf-8"):
+        body = body.encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_index(self):
+        links = [f'<li><a href="/overview?team={quote(team)}&pi={quote(pi)}">{team} - {pi}</a></li>'
+                 for team, pi in self.server.cache.reports]
+
+        self._send(200, f"<html><body><h1>PI Overviews</h1><ul>{''.join(links)}</ul></body></html>",
+                   CONTENT_TYPES["html"])
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/":
+            return self._send_index()
+
+        if url.path != "/overview":
+            return self._send(404, "Not found")
+
+        outputFormat = params.get("format", "html")
+        key = (params.get("team"), params.get("pi"))
+
+        if outputFormat not in ("html", *FORMATS):
+            return self._send(400, f"Unknown format {outputFormat}")
+
+        if key not in self.server.cache.reports:
+            return self._send(404, f"No report configured for team {key[0]} and PI {key[1]}")
+
+        try:
+            jiraConf, reportConf, metrics = self.server.cache.get(*key)
+            report = render_pi_overview(jiraConf, reportConf, metrics, outputFormat,
+                                        showWarnings=params.get("warnings") == "1",
+                                        showAssignee=params.get("assignee") == "1")
+
+        except Exception as ex:
+            console.log(f"Failed to produce report: {ex!r}", style="red")
+            return self._send(502, repr(ex))
+
+        self._send(200, report, CONTENT_TYPES[outputFormat])
+
+    def log_message(self, format, *args):
+        console.log(f"{self.address_string()} {format % args}", style="dim")
+
+
+def serve_reports(jiraConf, config, host="127.0.0.1", port=8080, ttl=300):
+    reports = get_reports(jiraConf, config)
+
+    server = ThreadingHTTPServer((host, port), ReportRequestHandler)
+    server.cache = ReportCache(reports, ttl=ttl)
+
+    console.log(f"Serving {len(reports)} PI overviews on http://{host}:{port} (refreshed every {ttl}s)")
+
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.server_close()
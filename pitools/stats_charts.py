@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from utils.issue_table import IssueTable
+
+STATUS_DURATIONS = ("devDuration", "codeReview", "qaDuration", "demoDuration")
+
+# issue table of the worker process, opened (memory-mapped) once per process
+_table = None
+
+
+def _open_table(tablePath):
+    global _table
+    _table = IssueTable.open(tablePath)
+
+
+def get_chart_jobs(table, iterations):
+    """One chart per discipline and iteration with issues"""
+
+    disciplines = sorted({discipline for value in table["discipline"] for discipline in value.split(",") if value})
+    iterationCol = table["iteration"]
+
+    return [(discipline, iteration) for discipline in disciplines for iteration in iterations
+            if np.any(table.contains("discipline", discipline) & (iterationCol == iteration))]
+
+
+def _plot_time_in_status(ax, durations):
+    ax.boxplot([durations[name][~np.isnan(durations[name])] for name in STATUS_DURATIONS])
+    ax.set_xticks(range(1, len(STATUS_DURATIONS) + 1), STATUS_DURATIONS)
+    ax.set_title("Time in status")
+    ax.set_ylabel("Days")
+
+
+def _plot_status_histogram(ax, durations):
+    for name in STATUS_DURATIONS:
+        values = durations[name][~np.isnan(durations[name])]
+        ax.hist(values, bins=10, alpha=0.5, label=name)
+
+    ax.set_title("Time in status distribution")
+    ax.set_xlabel("Days")
+    ax.legend(fontsize="small")
+
+
+def _plot_cycle_time_vs_estimate(ax, estimate, cycleTime):
+    valid = ~np.isnan(estimate) & ~np.isnan(cycleTime)
+    estimate, cycleTime = estimate[valid], cycleTime[valid]
+
+    ax.scatter(estimate, cycleTime, alpha=0.6)
+
+    # linear fit
+    if len(np.unique(estimate)) > 1:
+        slope, intercept = np.polyfit(estimate, cycleTime, 1)
+        x = np.linspace(estimate.min(), estimate.max(), 10)
+        ax.plot(x, slope * x + intercept, color="red", label=f"{slope:.2f} days/SP + {intercept:.2f}")
+        ax.legend(fontsize="small")
+
+    ax.set_title("Cycle time vs. estimate")
+    ax.set_xlabel("Story Points")
+    ax.set_ylabel("Cycle time (days)")
+
+
+def render_chart(discipline, iteration, filepath):
+    """Renders the charts of a discipline / iteration from the worker's issue table"""
+
+    rows = _table.contains("discipline", discipline) & (_table["iteration"] == iteration)
+    durations = {name: np.asarray(_table[name], dtype=float)[rows] for name in STATUS_DURATIONS if name in _table}
+    durations.update({name: np.array([]) for name in STATUS_DURATIONS if name not in durations})
+
+    fig = Figure(figsize=(18, 5))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(1, 3)
+
+    _plot_time_in_status(axes[0], durations)
+    _plot_status_histogram(axes[1], durations)
+    _plot_cycle_time_vs_estimate(axes[2],
+                                 np.asarray(_table["spEstimate"], dtype=float)[rows],
+                                 np.asarray(_table["cycleTime"], dtype=float)[rows]
+                                 if "cycleTime" in _table else np.full(rows.sum(), np.nan))
+
+    fig.suptitle(f"{discipline.upper()} - {iteration} ({rows.sum()} stories)")
+    fig.tight_layout()
+    fig.savefig(filepath)
+
+    return filepath
+
+
+def render_charts(tablePath, outputDir, iterations, maxWorkers=None):
+    """Renders the charts of every discipline and iteration in parallel processes
+
+    Every worker memory-maps the same issue table, so the data isn't copied or re-derived per chart
+    """
+
+    os.makedirs(outputDir, exist_ok=True)
+
+    jobs = get_chart_jobs(IssueTable.open(tablePath), iterations)
+    filepaths = [os.path.join(outputDir, f"{discipline.replace('/', '-')}-{iteration}.png")
+                 for discipline, iteration in jobs]
+
+    with ProcessPoolExecutor(max_workers=maxWorkers, initializer=_open_table, initargs=(tablePath,)) as executor:
+        return list(executor.map(render_chart, *zip(*jobs), filepaths)) if jobs else list()
@@ -2,9 +2,14 @@ import os
 from dataclasses import dataclass, field
 
 from rich.console import Console
+from rich.table import Table
 
-from utils.issue_parsing import extract_issue_info
-from utils.jira_jql import run_jira_jql
+from stats_charts import render_charts
+from utils.issue_parsing import extract_issues_info, get_sprint_name
+from utils.issue_table import write_issue_table
+from utils.jira_jql import get_sprint_queries, iter_jira_pages
+from utils.scoped import ScopedContainer
+from utils.warning_rules import compile_rules
 
 
 @dataclass
@@ -14,46 +19,99 @@ class DataContainer:
     jiraConf: dict = field(default_factory=dict)
     piReportConf: dict = field(default_factory=dict)
     rawIssues: list = field(default_factory=list)
+    resolved: dict = field(default_factory=dict)
     issues: list = field(default_factory=list)
     issueFile: str = str()
     metrics: dict = field(default_factory=lambda: {
         "epics"           : dict(),
         "loadByDiscipline": dict(),
-        "loadByAssignee"  : dict()}
+        "loadByAssignee"  : dict(),
+        "rollover"        : dict()}
                           )
     outputPath: str = str()
     outputDir: str = str()
+    tablePath: str = str()
+    warningRules: tuple = tuple()
 
 
-dc = DataContainer()
+# state of the current report, see utils/scoped.py
+dc = ScopedContainer(DataContainer)
 console = Console()
 
 
+def is_stats_issue(jiraConf, piReportConf, issue):
+    """Whether a (raw) issue is one _get_issues retrieves, i.e. a resolved story of the team in the PI's sprints"""
+
+    fields_ = issue.get("fields") or {}
+    sprints = {get_sprint_name(sprint) for sprint in fields_.get("customfield_10007") or []}
+
+    return all((
+        (fields_.get("customfield_15500") or {}).get("value") == jiraConf.get("teamName"),
+        (fields_.get("issuetype") or {}).get("name") in ("Story", "Defect"),
+        bool(fields_.get("resolutiondate")),
+        (fields_.get("status") or {}).get("name") != "Canceled",
+        bool(sprints.intersection(piReportConf.get("iterations")))
+    ))
+
+
+def _add_issues(issues, infos):
+    """Adds parsed stories, keeping their resolution date"""
+
+    for issue, info in zip(issues, infos):
+        ul = [0, 0.5, 1, 1.5, 2.5, 4, 6.5, 10, 20, 50]
+        es = [1, 1, 2, 3, 5, 8, 13, 20, 40, 100]
+
+        newEstimate = [n for n, i in enumerate(ul) if i <= info["cycleTime"]][-1]
+
+        info = info | {"newEstimate": es[newEstimate]}
+
+        dc.resolved[info.get("key")] = issue.get("fields", {}).get("resolutiondate") or ""
+        dc.rawIssues.append(info)
+
+
 def _get_issues():
-    jql = ('"Team Name" = Crewmates'
+    jql = (f'"Team Name" = "{dc.jiraConf.get("teamName")}"'
            + ' AND issuetype in (Story, Defect)'
            + ' AND resolved is not EMPTY'
            + ' AND status != Canceled'
-           + f' AND Sprint in ({",".join(dc.piReportConf.get("iterations"))})'
            + ' ORDER BY resolved DESC'
            )
 
     # jql = "key = TPRT-21099"
-    issues = run_jira_jql(dc.jiraConf, jql, expand="changelog")
+    queries = get_sprint_queries(dc.jiraConf, dc.piReportConf.get("iterations"), jql)
 
-    console.log(f"Parsing issues...")
+    console.log(f"Retrieving and parsing issues...")
 
-    for issue in issues:
-        info = extract_issue_info(dc.jiraConf, issue)
+    # each page is parsed while the following pages are retrieved
+    for issues in iter_jira_pages(dc.jiraConf, queries, expand="changelog"):
+        _add_issues(issues, extract_issues_info(dc.jiraConf, issues, dc.warningRules, strict=True))
 
-        ul = [0, 0.5, 1, 1.5, 2.5, 4, 6.5, 10, 20, 50]
-        es = [1, 1, 2, 3, 5, 8, 13, 20, 40, 100]
 
-        newEstimate = [n for n, i in enumerate(ul) if i <= info["cycleTime"]][-1]
+def _get_rollover_metrics():
+    """Number of stories and points rolled over from each iteration to the next"""
 
-        info = info | {"newEstimate": es[newEstimate]}
+    for info in dc.rawIssues:
+        for iteration in info.get("rolledFrom", []):
+            res = dc.metrics["rollover"].setdefault(iteration, {"issues": 0, "points": 0})
+            res["issues"] += 1
+            res["points"] += info.get("spEstimate")
 
-        dc.rawIssues.append(info)
+
+def print_rollover_metrics(res):
+    table = Table(show_header=True, header_style="bold", min_width=100)
+
+    for col in ("Iteration", "Stories Rolled Over", "Points Rolled Over"):
+        table.add_column(col, justify="right")
+
+    iterations = dc.piReportConf.get("iterations")
+    for iteration in [*iterations, *sorted(set(res) - set(iterations))]:
+        table.add_row(iteration, str(res.get(iteration, {}).get("issues", 0)),
+                      str(res.get(iteration, {}).get("points", 0)))
+
+    sprintCounts = [info.get("sprintCount") for info in dc.rawIssues if "sprintCount" in info]
+    console.print(table)
+    console.print(f"Stories crossed {sum(sprintCounts) / max(len(sprintCounts), 1):.2f} sprints on average"
+                  + f" ({max(sprintCounts, default=0)} max)")
 
 
 def _write_to_file(data):
@@ -84,16 +142,24 @@ def _create_output_dir():
         console.log(f"Directory created: {dc.outputDir}")
 
 
-def get_story_stats(jiraConf, piReportConf):
+def _get_story_stats(jiraConf, piReportConf, charts, issues, infos):
     dc.jiraConf = jiraConf
     dc.piReportConf = piReportConf
+    dc.warningRules = compile_rules(jiraConf, piReportConf.get("warningRules"))
     dc.outputDir = dc.piReportConf.get("statsOutputDir")
     dc.outputFile = dc.piReportConf.get("statsFileName") + ".tsv"
     dc.outputPath = os.path.join(dc.outputDir, dc.outputFile)
+    dc.tablePath = os.path.join(dc.outputDir, dc.piReportConf.get("statsFileName") + ".issues")
 
     _create_output_dir()
 
-    _get_issues()
+    if issues is None:
+        _get_issues()
+    else:
+        _add_issues(issues, infos)
+
+    # per sprint results are merged as they arrive, restore the overall order
+    dc.rawIssues.sort(key=lambda info: dc.resolved.get(info.get("key")), reverse=True)
 
     console.log(f"Creating file...")
 
@@ -101,10 +167,33 @@ def get_story_stats(jiraConf, piReportConf):
 
     console.log(f"File written to {dc.outputPath}")
 
-    # TODO: box plot time in each status
-    # TODO: Remap SP to true SP
+    write_issue_table(dc.rawIssues, dc.tablePath)
+
+    console.log(f"Issue table written to {dc.tablePath}")
+
+    _get_rollover_metrics()
+
+    print_rollover_metrics(dc.metrics["rollover"])
 
-    # TODO: time in status hist: overlay all status on same plot?
-    # TODO: time to complete vs. story point estimate scatter w/fit
+    if charts:
+        console.log(f"Rendering charts...")
+
+        chartDir = os.path.join(dc.outputDir, "charts")
+        filepaths = render_charts(dc.tablePath, chartDir, dc.piReportConf.get("iterations"))
+
+        console.log(f"{len(filepaths)} charts written to {chartDir}")
+
+    # TODO: Remap SP to true SP
     # TODO: cyle time / lead time?
-    # TODO: Rollover
+
+
+def get_story_stats(jiraConf, piReportConf, charts=False, issues=None, infos=None):
+    """Writes the stats of the PI's stories, returning the parsed stories
+
+    The stories are retrieved from Jira, unless given as issues (with changelog) and their parsed infos
+    """
+
+    with dc.scope():
+        _get_story_stats(jiraConf, piReportConf, charts, issues, infos)
+
+        return dc.rawIssues
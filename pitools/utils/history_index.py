@@ -0,0 +1,103 @@
+from bisect import bisect_right
+from copy import deepcopy
+from datetime import datetime
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f%z'
+
+# changelog field: (jira field id, conversion of the changelog string to the field value)
+INDEXED_FIELDS = {
+    "status"      : ("status", lambda value: {"name": value} if value else None),
+    "resolution"  : ("resolution", lambda value: {"name": value} if value else None),
+    "Sprint"      : ("customfield_10007", lambda value: value.split(", ") if value else None),
+    "Story Points": ("customfield_10501", lambda value: float(value) if value else None),
+    "Flagged"     : (None, lambda value: value or None),
+}
+
+
+def _parse_time(timestamp):
+    return datetime.strptime(timestamp, TIME_FORMAT)
+
+
+class HistoryIndex:
+    """Interval index over the changelog of issues
+
+    For each issue and indexed field, the change times are kept sorted alongside the value before and
+    after each change, so the value of a field at any time is found with a binary search. The issue's
+    histories are kept sorted too, so its changelog at any time is a slice of them.
+    """
+
+    def __init__(self):
+        self.changes = dict()
+        self.histories = dict()
+        self.created = dict()
+
+    def add(self, issue):
+        key = issue.get("key")
+        fields = dict()
+
+        histories = sorted(((_parse_time(history.get("created")), history)
+                            for history in (issue.get("changelog") or {}).get("histories", [])),
+                           key=lambda x: x[0])
+
+        for timestamp, history in histories:
+            for item in history.get("items", []):
+                if item.get("field") in INDEXED_FIELDS:
+                    times, froms, tos = fields.setdefault(item.get("field"), (list(), list(), list()))
+                    times.append(timestamp)
+                    froms.append(item.get("fromString"))
+                    tos.append(item.get("toString"))
+
+        self.changes[key] = fields
+        self.histories[key] = ([timestamp for timestamp, _ in histories], [history for _, history in histories])
+
+        if created := (issue.get("fields") or {}).get("created"):
+            self.created[key] = _parse_time(created)
+
+    @classmethod
+    def from_issues(cls, issues):
+        index = cls()
+
+        for issue in issues:
+            index.add(issue)
+
+        return index
+
+    def has_changes(self, key, field):
+        return field in self.changes.get(key, {})
+
+    def value_at(self, key, field, when):
+        """Returns the changelog value of field at time when (None if the field never changed)"""
+
+        if not self.has_changes(key, field):
+            return None
+
+        times, froms, tos = self.changes[key][field]
+        n = bisect_right(times, when)
+
+        return froms[0] if n == 0 else tos[n - 1]
+
+    def issue_at(self, issue, when):
+        """Reconstructs a raw issue as it was at time when, or None if it did not exist yet"""
+
+        key = issue.get("key")
+
+        if key not in self.changes:
+            self.add(issue)
+
+        if (created := self.created.get(key)) and created > when:
+            return None
+
+        # the changelog is sliced from the sorted histories below, rather than copied
+        res = deepcopy({name: value for name, value in issue.items() if name != "changelog"})
+
+        for field, (fieldId, convert) in INDEXED_FIELDS.items():
+            if fieldId and self.has_changes(key, field):
+                res["fields"][fieldId] = convert(self.value_at(key, field, when))
+
+        # later histories didn't happen yet
+        if changelog := issue.get("changelog"):
+            times, histories = self.histories[key]
+            n = bisect_right(times, when)
+            res["changelog"] = changelog | {"histories": histories[:n], "total": n}
+
+        return res
@@ -1,5 +1,5 @@
 import re
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from datetime import datetime, timezone
 
 import holidays as pyholidays
@@ -7,17 +7,18 @@ import jmespath as jp
 from business_duration import businessDuration as busDur
 from rich.console import Console
 
+from .warning_rules import apply_warnings, compile_rules
+
 
 @dataclass
 class DataContainer:
-    """Class for storing required data"""
+    """Class for storing required data (constants only, so parsing can run concurrently)"""
 
-    jiraConf: dict = field(default_factory=dict)
     DEFAULTTIME = datetime(1970, 1, 1, tzinfo=timezone.utc)
 
 
 dc = DataContainer()
-console = Console()
+console = Console(stderr=True)
 
 
 def _get_iteration(key, iterationStr):
@@ -47,9 +48,17 @@ def _get_iteration(key, iterationStr):
     return iteration, num
 
 
-def _get_discipline_from_summary(summary):
+def get_sprint_name(sprint):
+    """Extracts the name from a sprint field value"""
+
+    res = re.search("name=([^,\\]]+)", sprint)
+
+    return res.group(1) if res else sprint
+
+
+def _get_discipline_from_summary(jiraConf, summary):
     """[DEPRECATED] Extracts discipline from summary"""
-    ignored = ("spike", "enabler", {dc.jiraConf.get("teamName")})
+    ignored = ("spike", "enabler", {jiraConf.get("teamName")})
     matches = [word.lower() for word in re.findall("\[(.*?)\]", summary)]
     matches = ",".join(filter(lambda m: m.lower() not in ignored, matches))
     return matches if matches else "N/A"
@@ -78,16 +87,96 @@ def _calc_business_dur(start, end):
                   )
 
 
-def _get_status_timings(key, changelog):
-    # TODO: replace with jmespath. Starting options:
-    # items = jp.search("[*].items[] | [?field == 'status']", log)
-    items = jp.search(
-            "[?items[?field=='status']] | sort_by(@, &created)", changelog)
+# Workflows
+# -----------------------------
+# Story: To Do, Backlog, Itertion Ready, In Development, In Code Review, IN QA, In Acceptance, Accepted, Canceled
+
+STATUS_MAP = {
+    "3"    : "devDuration",  #
+    "10011": None,  # Accepted
+    "10029": None,  # cancelled
+    "10044": "qaDuration",  # in qa
+    "10055": None,  # todo
+    "10561": None,  # backlog
+    "11963": None,  # Awaiting Internal
+    "11966": "devDuration",  # In Development
+    "11967": "demoDuration",  # In Acceptance
+    "12161": "codeReview",  # In Code Review
+    "12661": None,  # iteration ready
+    "12865": None,  # Analysis Done
+    "13762": None,  # Pending
+    "14361": None,  # Analysis In Progress
+}
+
+# issue types following the story workflow, i.e. the only ones with status timings
+TIMED_TYPES = ("Story", "Defect")
+
+
+def _update_status_timings(key, res, timestamp, change):
+    duration = _calc_business_dur(res.get('updated'), timestamp)
+
+    codeFrom = change.get('from')
+    codeTo = change.get('to')
+
+    # To In Dev.
+    if codeTo in ("11966", "3"):
+
+        if res["started"] == dc.DEFAULTTIME:
+            res["started"] = timestamp
+        else:
+            res["onHoldDuration"] += duration
+
+    # accepted, Done
+    elif codeTo in ("10011", "10053"):
+        res["accepted"] = timestamp
+
+    # all handled status'
+    if codeFrom in STATUS_MAP:
+
+        if metric := STATUS_MAP.get(codeFrom):
+            res[metric] += duration
+
+    # Unhandled
+    else:
+        _raise_unhandled("From", key, change)
+
+    res['updated'] = timestamp
+
+
+def _update_blocked_time(res, state, timestamp, change):
+    duration = _calc_business_dur(state["blockedSince"], timestamp)
+
+    # blocked
+    if not change.get('from'):
+        state["blockedSince"] = timestamp
+
+    #  unblocked
+    elif change.get('fromString') == "Blocked":
+        res["blockedDuration"] += duration
+
 
-    if not items:
-        return dict()
+def _split_sprints(value):
+    return [sprint for sprint in (value or "").split(", ") if sprint]
 
-    res = {
+
+def _update_sprints(res, change):
+    fromSprints = _split_sprints(change.get('fromString'))
+    toSprints = _split_sprints(change.get('toString'))
+
+    # carried over from its latest sprint to a new one: Jira keeps the (closed) sprint in the field, whereas
+    # re-planning replaces it
+    if fromSprints and fromSprints[-1] in toSprints and [sprint for sprint in toSprints if sprint not in fromSprints]:
+        res["rolledFrom"].append(fromSprints[-1])
+
+
+def _walk_changelog(key, changelog, sprints, timed=True, strict=True):
+    """Status timings, blocked time and sprint rollovers from a single pass over the changelog
+
+    Status timings are only computed when timed. A status outside the story workflow raises when strict,
+    otherwise the issue is left without status timings
+    """
+
+    timings = {
         "started"       : dc.DEFAULTTIME,
         "updated"       : dc.DEFAULTTIME,
         "accepted"      : dc.DEFAULTTIME,
@@ -98,154 +187,69 @@ def _get_status_timings(key, changelog):
         "cycleTime"     : 0,
         "onHoldDuration": 0
     }
+    blocked = {"blockedDuration": 0}
+    rollover = {"rolledFrom": list()}
+    state = {"blockedSince": dc.DEFAULTTIME, "hasStatus": False, "unhandled": False}
 
-    # Workflows
-    # -----------------------------
-    # Story: To Do, Backlog, Itertion Ready, In Development, In Code Review, IN QA, In Acceptance, Accepted, Canceled
-
-    statusMap = {
-        "3"    : "devDuration",  #
-        "10011": None,  # Accepted
-        "10029": None,  # cancelled
-        "10044": "qaDuration",  # in qa
-        "10055": None,  # todo
-        "10561": None,  # backlog
-        "11963": None,  # Awaiting Internal
-        "11966": "devDuration",  # In Development
-        "11967": "demoDuration",  # In Acceptance
-        "12161": "codeReview",  # In Code Review
-        "12661": None,  # iteration ready
-        "12865": None,  # Analysis Done
-        "13762": None,  # Pending
-        "14361": None,  # Analysis In Progress
-    }
-
-    for item in items:
-        timestamp = datetime.strptime(
-                item.get("created"), '%Y-%m-%dT%H:%M:%S.%f%z')
-        change = jp.search("[?field=='status']", item.get("items"))[0]
-        duration = _calc_business_dur(res.get('updated'), timestamp)
-
-        codeFrom = change.get('from')
-        codeTo = change.get('to')
+    for history in sorted(changelog, key=lambda history: history.get("created")):
+        timestamp = datetime.strptime(history.get("created"), '%Y-%m-%dT%H:%M:%S.%f%z')
+        handled = set()
 
-        # To In Dev.
-        if codeTo in ("11966", "3"):
+        for change in history.get("items"):
+            field_ = change.get("field")
 
-            if res["started"] == dc.DEFAULTTIME:
-                res["started"] = timestamp
-            else:
-                res["onHoldDuration"] += duration
+            # only the first change of status / flag in a history counts
+            if field_ in handled:
+                continue
 
-        # accepted, Done
-        elif codeTo in ("10011", "10053"):
-            res["accepted"] = timestamp
+            if field_ == "status" and timed:
+                if strict or change.get('from') in STATUS_MAP:
+                    _update_status_timings(key, timings, timestamp, change)
+                    state["hasStatus"] = True
 
-        # all handled status'
-        if codeFrom in statusMap:
+                # other workflow
+                else:
+                    state["unhandled"] = True
 
-            if metric := statusMap.get(codeFrom):
-                res[metric] += duration
+            elif field_ == "Flagged":
+                _update_blocked_time(blocked, state, timestamp, change)
 
-        # Unhandled
-        else:
-            _raise_unhandled("From", key, change)
-
-        res['updated'] = timestamp
+            elif field_ == "Sprint":
+                _update_sprints(rollover, change)
+                continue
 
-    if res["started"] > dc.DEFAULTTIME:
-        res["cycleTime"] = _calc_business_dur(
-                res["started"], res["accepted"])
+            handled.add(field_)
 
-    return res
+    res = dict()
 
+    if state["hasStatus"] and not state["unhandled"]:
+        if timings["started"] > dc.DEFAULTTIME:
+            timings["cycleTime"] = _calc_business_dur(
+                    timings["started"], timings["accepted"])
 
-def _get_blocked_time(changelog):
-    # TODO: replace with jmespath. Starting options:
-    # items = jp.search("[*].items[] | [?field == 'status']", log)
-    items = jp.search(
-            "[?items[?field=='Flagged']] | sort_by(@, &created)", changelog)
+        res.update(timings)
 
-    res = {
-        "blockedDuration": 0,
-    }
-
-    previousTime = dc.DEFAULTTIME
-    for item in items:
-        timestamp = datetime.strptime(
-                item.get("created"), '%Y-%m-%dT%H:%M:%S.%f%z')
-        change = jp.search("[?field=='Flagged']", item.get("items"))[0]
-        duration = _calc_business_dur(previousTime, timestamp)
-
-        # blocked
-        if not change.get('from'):
-            previousTime = timestamp
-
-        #  unblocked
-        elif change.get('fromString') == "Blocked":
-            res["blockedDuration"] += duration
+    res.update(blocked)
+    res.update({
+        # the sprints crossed, as closed sprints are kept in the field
+        "sprintCount": len(dict.fromkeys(sprints)),
+        "rolledFrom" : rollover["rolledFrom"]
+    })
 
     return res
 
 
-def _check_for_warnings(info):
+def _check_for_warnings(jiraConf, info):
     """Checks if there is anything of concern with an issue"""
+    return apply_warnings([info], compile_rules(jiraConf))[0].get("warnings")
+
 
-    # if accepted or cancelled, doesn't matter. Skip
-    if any((
-            info.get("resolved"),
-            info.get("issueType") == "Epic",
-            (len(info.get("discipline")) == 1 and 'po/pm' in info.get("discipline")))
-    ):
-        return list()
-
-    noEstimates = [info.get("beEstimate") > 0, info.get("feEstimate") > 0, info.get("qaEstimate") > 0].count(True)
-    noDisciplines = len(info.get("discipline"))
-
-    warningMap = [
-        # Check if issue is not scheduled to be completed in current PI
-        {
-            "test"   : info.get("iterNo") == 1000,
-            "warning": "Issue not scheduled in current PI"
-        },
-        # Check if missing team name
-        {
-            "test"   : info.get("teamName") != dc.jiraConf.get("teamName"),
-            "warning": f"Team Name ({info.get('teamName')}) does not match the config ({dc.jiraConf.get('teamName')})"
-        },
-        # Check if missing epic
-        {
-            "test"   : info.get("epicKey") == "N/A",
-            "warning": "Issue not assigned to epic"
-        },
-        # Check if missing discipline
-        {
-            "test"   : info.get("discipline")[0] == "na",
-            "warning": "Issue is missing labels"
-        },
-        # Check if missing sp estimate
-        {
-            "test"   : info.get("spEstimate") == 0,
-            "warning": "Issue has not been estimated"
-        },
-        # Check if the right number of discipline estimates are set
-        {
-            "test"   : noDisciplines > 1 and (noEstimates != noDisciplines),
-            "warning": "Issue is missing discipline estimate"
-        },
-        {
-            "test"   : noDisciplines == 1 and (noEstimates > 1),
-            "warning": "Issue has more estimates than disciplines"
-        }
-    ]
-
-    return [item.get("warning") for item in warningMap if item.get("test")]
-
-
-def extract_issue_info(jiraConf, issue):
-    """Returns a flattened version of info with relevant info"""
-
-    dc.jiraConf = jiraConf
+def extract_issue_info(jiraConf, issue, checkWarnings=True, strict=False):
+    """Returns a flattened version of info with relevant info
+
+    Status timings are parsed for stories and defects. Unless strict (i.e. for story stats), issues with
+    statuses outside the story workflow are left without timings rather than raising
+    """
 
     key = jp.search("key", issue)
 
@@ -259,7 +263,7 @@ def extract_issue_info(jiraConf, issue):
         "epicKey"   : jp.search("fields.customfield_11000", issue) or "N/A",
         "issueType" : jp.search("fields.issuetype.name", issue) or "N/A",
         "labels"    : jp.search("fields.labels", issue),
-        "link"      : f"{dc.jiraConf.get('url')}/browse/{key}",
+        "link"      : f"{jiraConf.get('url')}/browse/{key}",
         "qaEstimate": jp.search("fields.customfield_20502", issue) or 0,
         "resolution": jp.search("fields.resolution.name", issue) or "Unresolved",
         "spEstimate": jp.search("fields.customfield_10501", issue) or 0,
@@ -290,12 +294,20 @@ def extract_issue_info(jiraConf, issue):
         "iterNo"   : iterNo,
     })
 
-    # status timings
+    # status timings, blocked time & rollovers
     if changelog := jp.search("changelog.histories", issue):
-        tmp.update(_get_status_timings(key, changelog))
-        tmp.update(_get_blocked_time(changelog))
+        sprints = [get_sprint_name(sprint) for sprint in jp.search("fields.customfield_10007", issue) or []]
+        tmp.update(_walk_changelog(key, changelog, sprints, strict or tmp["issueType"] in TIMED_TYPES, strict))
 
     # warnigns
-    tmp["warnings"] = _check_for_warnings(tmp)
+    tmp["warnings"] = _check_for_warnings(jiraConf, tmp) if checkWarnings else list()
 
     return tmp
+
+
+def extract_issues_info(jiraConf, issues, rules=None, strict=False):
+    """Returns the flattened info of a batch of issues, checking warnings for the whole batch at once"""
+
+    infos = [extract_issue_info(jiraConf, issue, checkWarnings=False, strict=strict) for issue in issues]
+
+    return apply_warnings(infos, rules or compile_rules(jiraConf))
@@ -0,0 +1,156 @@
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+SCHEMA_FILE = "schema.json"
+DICTIONARY_FILE = "dictionary.npy"
+LIST_SEPARATOR = ","
+
+
+def _infer_kind(values):
+    """Determines the column kind from the (non-null) values of a field"""
+
+    values = [value for value in values if value is not None]
+
+    if not values:
+        return "str"
+
+    if all(isinstance(value, bool) for value in values):
+        return "bool"
+
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return "int"
+
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return "float"
+
+    if all(isinstance(value, datetime) for value in values):
+        return "datetime"
+
+    return "str"
+
+
+def _to_str(value):
+    if value is None:
+        return ""
+
+    if isinstance(value, (list, tuple, set)):
+        return LIST_SEPARATOR.join(str(item) for item in value)
+
+    return str(value)
+
+
+def _to_datetime64(value):
+    if value is None:
+        return np.datetime64("NaT")
+
+    return np.datetime64(value.astimezone(timezone.utc).replace(tzinfo=None), "us")
+
+
+class IssueTable:
+    """Columnar table of parsed issues (as returned by extract_issue_info)
+
+    Numeric, boolean and datetime fields are stored as numpy arrays. All other fields (including lists,
+    which are joined) are stored as int32 codes into a single string dictionary. A table saved to disk is a
+    directory of .npy files which are memory-mapped when opened, so no parsing or copying is needed to use it.
+    """
+
+    def __init__(self, columns, kinds, dictionary):
+        self.columns = columns
+        self.kinds = kinds
+        self.dictionary = dictionary
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        """Returns a column, decoding string columns"""
+
+        if self.kinds[name] == "str":
+            return self.dictionary[self.columns[name]]
+
+        return self.columns[name]
+
+    def codes(self, name):
+        """Returns the dictionary codes of a string column"""
+        return self.columns[name]
+
+    def code(self, value):
+        """Returns the dictionary code of a string (-1 if not in the dictionary)"""
+
+        matches = np.flatnonzero(self.dictionary == value)
+
+        return int(matches[0]) if len(matches) else -1
+
+    def contains(self, name, item):
+        """Mask of rows of a (joined) list column that contain item"""
+
+        return np.array([item in value.split(LIST_SEPARATOR) for value in self[name]], dtype=bool)
+
+    @classmethod
+    def from_records(cls, records):
+        names = list(dict.fromkeys(name for record in records for name in record))
+        strings = {"": 0}
+        columns = dict()
+        kinds = dict()
+
+        for name in names:
+            values = [record.get(name) for record in records]
+
+            # nested records (e.g. an epic's children) are rows of the table themselves
+            if any(isinstance(value, dict) for value in values):
+                continue
+
+            kind = kinds[name] = _infer_kind(values)
+
+            if kind == "bool":
+                columns[name] = np.array([bool(value) for value in values], dtype=bool)
+            elif kind == "int":
+                columns[name] = np.array([value or 0 for value in values], dtype=np.int64)
+            elif kind == "float":
+                columns[name] = np.array([np.nan if value is None else value for value in values], dtype=np.float64)
+            elif kind == "datetime":
+                columns[name] = np.array([_to_datetime64(value) for value in values], dtype="datetime64[us]")
+            else:
+                columns[name] = np.array([strings.setdefault(_to_str(value), len(strings)) for value in values],
+                                         dtype=np.int32)
+
+        return cls(columns, kinds, np.array(list(strings), dtype=str))
+
+    def save(self, path):
+        """Writes the table to the directory path"""
+
+        os.makedirs(path, exist_ok=True)
+
+        for name, column in self.columns.items():
+            np.save(os.path.join(path, f"{name}.npy"), column, allow_pickle=False)
+
+        np.save(os.path.join(path, DICTIONARY_FILE), self.dictionary, allow_pickle=False)
+
+        with open(os.path.join(path, SCHEMA_FILE), "w") as fo:
+            json.dump({"length": len(self), "columns": self.kinds}, fo, indent=2)
+
+        return path
+
+    @classmethod
+    def open(cls, path, mmapMode="r"):
+        """Opens a saved table, memory-mapping its columns"""
+
+        with open(os.path.join(path, SCHEMA_FILE), "r") as fi:
+            kinds = json.load(fi).get("columns")
+
+        columns = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmapMode, allow_pickle=False)
+                   for name in kinds}
+        dictionary = np.load(os.path.join(path, DICTIONARY_FILE), mmap_mode=mmapMode, allow_pickle=False)
+
+        return cls(columns, kinds, dictionary)
+
+
+def write_issue_table(records, path):
+    """Saves parsed issues as a memory-mappable columnar table"""
+    return IssueTable.from_records(records).save(path)
@@ -1,20 +1,50 @@
+import hashlib
 import json
 import logging
 import os
+import threading
+import time
+from urllib.parse import urlencode
 
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 log = logging.getLogger("atlassian")
 
+DEFAULT_HEADERS = {'Content-Type': 'application/json', 'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'}
+
 
 class AtlassianRestAPI:
 
-    def __init__(self, url):
+    def __init__(self, url, poolSize=10, recordDir=None, replayDir=None):
         self.url = url
         self.username = str()
         self.password = str()
 
+        # raw JSON responses are saved to recordDir, or served from replayDir instead of the network
+        self.recordDir = recordDir
+        self.replayDir = replayDir
+
+        if self.recordDir:
+            os.makedirs(self.recordDir, exist_ok=True)
+
+        # pooled connections, shared by all requests (and threads) using this instance
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # transfer / decode metrics for JSON responses
+        self.metrics = {"requests": 0, "wireBytes": 0, "decodedBytes": 0, "decodeTime": 0.0, "uncompressed": 0,
+                        "decoder": "orjson" if orjson else "json"}
+        self._metricsLock = threading.Lock()
+
         # get jira credential from .env
         self._get_credentials()
 
@@ -25,9 +55,9 @@ class AtlassianRestAPI:
         self.password = os.getenv("JIRA_PASSWORD")
 
     def request(self, method='GET', path='/', data=None,
-                headers={'Content-Type': 'application/json', 'Accept': 'application/json'}):
+                headers=DEFAULT_HEADERS):
 
-        return requests.request(
+        return self.session.request(
                 method=method,
                 url='{0}{1}'.format(self.url, path),
                 headers=headers,
@@ -35,37 +65,120 @@ class AtlassianRestAPI:
                 auth=(self.username, self.password),
                 timeout=60)
 
-    def get(self, path, data=None, headers={'Content-Type': 'application/json', 'Accept': 'application/json'}):
+    @staticmethod
+    def _response_file(directory, path):
+        """Returns the file a response is recorded to / replayed from"""
+
+        endpoint = path.split("?")[0].strip("/").replace("/", "_")
+        digest = hashlib.sha1(path.encode()).hexdigest()
+
+        return os.path.join(directory, f"{endpoint}-{digest}.json")
+
+    def _replay(self, path):
+        filePath = self._response_file(self.replayDir, path)
+
+        if not os.path.isfile(filePath):
+            raise FileNotFoundError(f"No recorded response for {path} in {self.replayDir}")
+
+        with open(filePath, "rb") as fi:
+            return fi.read()
+
+    def get_json(self, path):
+        """GETs path and decodes the (compressed) JSON response, recording transfer metrics
+
+        Raises requests.HTTPError on a non 2xx response
+        """
+
+        if self.replayDir:
+            content = self._replay(path)
+            start = time.perf_counter()
+            data = orjson.loads(content) if orjson else json.loads(content)
+
+            with self._metricsLock:
+                self.metrics["requests"] += 1
+                self.metrics["decodedBytes"] += len(content)
+                self.metrics["decodeTime"] += time.perf_counter() - start
+
+            return data
+
+        res = self.get(path)
+
+        # raise on error responses (e.g. an invalid JQL query, or expired credentials), so they're never recorded
+        res.raise_for_status()
+        content = res.content
+
+        if self.recordDir:
+            with open(self._response_file(self.recordDir, path), "wb") as fo:
+                fo.write(content)
+
+        start = time.perf_counter()
+        data = orjson.loads(content) if orjson else json.loads(content)
+        decodeTime = time.perf_counter() - start
+
+        compressed = res.headers.get('Content-Encoding', '') in ('gzip', 'deflate')
+
+        # bytes read off the wire (i.e. before decompression) where available
+        wireBytes = getattr(res.raw, 'tell', lambda: 0)() or int(res.headers.get('Content-Length', len(content)))
+
+        with self._metricsLock:
+            if not compressed and not self.metrics["uncompressed"]:
+                log.warning(f'Jira returned an uncompressed response for {path.split("?")[0]}')
+
+            self.metrics["requests"] += 1
+            self.metrics["wireBytes"] += wireBytes
+            self.metrics["decodedBytes"] += len(content)
+            self.metrics["decodeTime"] += decodeTime
+            self.metrics["uncompressed"] += 0 if compressed else 1
+
+        return data
+
+    def get(self, path, data=None, headers=DEFAULT_HEADERS):
         return self.request('GET', path=path, data=data, headers=headers)
 
-    def post(self, path, data=None, headers={'Content-Type': 'application/json', 'Accept': 'application/json'}):
+    def post(self, path, data=None, headers=DEFAULT_HEADERS):
         try:
             return self.request('POST', path=path, data=data, headers=headers)
         except ValueError:
             log.debug('Received response with no content')
             return None
 
-    def put(self, path, data=None, headers={'Content-Type': 'application/json', 'Accept': 'application/json'}):
+    def put(self, path, data=None, headers=DEFAULT_HEADERS):
         try:
             return self.request('PUT', path=path, data=data, headers=headers)
         except ValueError:
             log.debug('Received response with no content')
             return None
 
-    def delete(self, path, data=None, headers={'Content-Type': 'application/json', 'Accept': 'application/json'}):
+    def delete(self, path, data=None, headers=DEFAULT_HEADERS):
         return self.request('DELETE', path=path, data=data, headers=headers)
 
 
 class Jira(AtlassianRestAPI):
 
     def jql(self, jql, expand='None', fields='*all', maxResults=100, startAt=0):
-        return self.get(
+        return self.get_json(
                 '/rest/api/2/search?'
-                + f'expand={expand}'
-                + f'&fields={fields}'
-                + f'&jql={jql}'
-                + f'&maxResults={maxResults}'
-                + f'&startAt={startAt}').json()
+                + urlencode({"expand": expand, "fields": fields, "jql": jql, "maxResults": maxResults,
+                             "startAt": startAt}))
+
+    def changelog(self, key, maxResults=100, startAt=0):
+        return self.get_json(
+                f'/rest/api/2/issue/{key}/changelog?'
+                + f'maxResults={maxResults}'
+                + f'&startAt={startAt}')
+
+    def board_sprints(self, boardId, maxResults=50, startAt=0):
+        return self.get_json(
+                f'/rest/agile/1.0/board/{boardId}/sprint?'
+                + urlencode({"maxResults": maxResults, "startAt": startAt}))
+
+    def sprint_issues(self, sprintId, jql=None, expand='None', fields='*all', maxResults=100, startAt=0):
+        params = {"expand": expand, "fields": fields, "maxResults": maxResults, "startAt": startAt}
+
+        if jql:
+            params["jql"] = jql
+
+        return self.get_json(f'/rest/agile/1.0/sprint/{sprintId}/issue?' + urlencode(params))
 
     def user(self, username):
         return self.get(f'/rest/api/3/user?accountId={username}')
@@ -0,0 +1,166 @@
+import json
+import math
+import re
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock
+
+from rich.console import Console
+
+from .jira_api import orjson
+from .jira_jql import SprintQuery, get_jira, run_jira_jqls
+
+console = Console(stderr=True)
+
+ORDER_BY = re.compile(r"(?:^|\s+)ORDER\s+BY\s+", re.IGNORECASE)
+
+
+def _updated_since(query, minutes):
+    """Restricts a query to the issues updated in the last minutes
+
+    Relative dates are used so the clause doesn't depend on the timezone of the Jira user
+    """
+
+    clause = f"updated >= -{minutes}m"
+
+    jql, *orderBy = ORDER_BY.split((query.jql if isinstance(query, SprintQuery) else query) or "", maxsplit=1)
+    jql = (f"({jql}) AND {clause}" if jql.strip() else clause) + (f" ORDER BY {orderBy[0]}" if orderBy else "")
+
+    return SprintQuery(query.sprintId, jql) if isinstance(query, SprintQuery) else jql
+
+
+class CacheEntry:
+    """Issues of a set of queries, as last synced from Jira"""
+
+    def __init__(self):
+        self.issues = dict()
+        self.body = b"[]"
+        self.synced = 0.0
+        self.fullSynced = 0.0
+
+
+class JiraCache:
+    """Shares the issues of queries between clients, keeping them in sync with Jira
+
+    A single Jira client (and connection pool) is used for all queries. Concurrent requests for the same
+    queries wait on one upstream fetch and are all served the same encoded response. Entries older than ttl
+    seconds are synced incrementally (only issues updated since the last sync are fetched), and fully
+    re-fetched every fullRefresh seconds so issues no longer matching the queries are dropped.
+    """
+
+    def __init__(self, jiraConf, ttl=60, fullRefresh=3600):
+        # the cache queries Jira directly
+        self.jiraConf = {key: value for key, value in jiraConf.items() if key != "cacheUrl"}
+        self.jiraInst = get_jira(self.jiraConf)
+        self.ttl = ttl
+        self.fullRefresh = fullRefresh
+        self.entries = dict()
+        self.inflight = dict()
+        self.lock = Lock()
+
+    def get(self, queries, expand=None, fields='*all'):
+        """Returns the JSON encoded issues of the queries, and whether they were served from the cache"""
+
+        key = json.dumps([queries, expand, fields])
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry and time.monotonic() - entry.synced < self.ttl:
+                return entry.body, "hit"
+
+            future = self.inflight.get(key)
+            owner = future is None
+
+            if owner:
+                future = self.inflight[key] = Future()
+
+        if not owner:
+            return future.result(), "shared"
+
+        try:
+            entry = self._sync(entry or CacheEntry(), queries, expand, fields)
+            future.set_result(entry.body)
+
+        except Exception as ex:
+            future.set_exception(ex)
+            raise ex
+
+        finally:
+            with self.lock:
+                if future.done() and not future.exception():
+                    self.entries[key] = entry
+
+                del self.inflight[key]
+
+        return entry.body, "miss"
+
+    def _sync(self, entry, queries, expand, fields):
+        now = time.monotonic()
+        queries = [SprintQuery(**query) if isinstance(query, dict) else query for query in queries]
+
+        if not entry.issues or now - entry.fullSynced >= self.fullRefresh:
+            entry.issues = {issue.get("key"): issue
+                            for issue in run_jira_jqls(self.jiraConf, queries, expand, fields, jiraInst=self.jiraInst)}
+            entry.fullSynced = now
+
+        else:
+            # a minute of overlap, as relative dates are rounded to the minute
+            minutes = math.ceil((now - entry.synced) / 60) + 1
+            updated = run_jira_jqls(self.jiraConf, [_updated_since(query, minutes) for query in queries],
+                                    expand, fields, jiraInst=self.jiraInst)
+
+            entry.issues = entry.issues | {issue.get("key"): issue for issue in updated}
+
+            console.log(f"{len(updated)} issues updated in the last {minutes} minutes", style="dim")
+
+        issues = list(entry.issues.values())
+        entry.body = orjson.dumps(issues) if orjson else json.dumps(issues).encode()
+        entry.synced = now
+
+        return entry
+
+
+class CacheRequestHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        if self.path != "/issues":
+            self.send_error(404)
+            return
+
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+            res, status = self.server.cache.get(body.get("queries", []), body.get("expand"),
+                                                body.get("fields", '*all'))
+
+        except Exception as ex:
+            console.log(f"Failed to retrieve issues: {ex!r}", style="red")
+            self.send_error(502, explain=repr(ex))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(res)))
+        self.send_header("X-Cache", status)
+        self.end_headers()
+        self.wfile.write(res)
+
+    def log_message(self, format, *args):
+        console.log(f"{self.address_string()} {format % args}", style="dim")
+
+
+def serve_cache(jiraConf, host="127.0.0.1", port=8765, ttl=60, fullRefresh=3600):
+    server = ThreadingHTTPServer((host, port), CacheRequestHandler)
+    server.cache = JiraCache(jiraConf, ttl=ttl, fullRefresh=fullRefresh)
+
+    console.log(f"Serving Jira cache on http://{host}:{port} (ttl {ttl}s, full refresh {fullRefresh}s)")
+
+    try:
+        server.serve_forever()
+
+    except KeyboardInterrupt:
+        pass
+
+    finally:
+        server.server_close()
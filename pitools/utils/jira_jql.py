@@ -1,13 +1,35 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from queue import Full, Queue
+from threading import Event, Lock, current_thread, main_thread
+
+import requests
 from rich.console import Console
 from rich.progress import Progress, BarColumn, TimeRemainingColumn
 
-from .jira_api import Jira
+from .jira_api import Jira, orjson
+
+console = Console(record=True, stderr=True)
+
+# issues of a single sprint (by id) retrieved through the agile API, filtered by jql
+SprintQuery = namedtuple("SprintQuery", ("sprintId", "jql"))
+
+# concurrent query (search) requests, and changelog page requests shared by all the queries of a run
+SEARCH_WORKERS = 6
+CHANGELOG_WORKERS = 10
+
+
+def get_jira(jiraConf, poolSize=SEARCH_WORKERS + CHANGELOG_WORKERS):
+    """Instantiates the jira client, recording or replaying responses if configured
 
-console = Console(record=True)
+    poolSize should cover the concurrent requests made with the client, so pooled connections are reused
+    """
+    return Jira(url=jiraConf.get("url"), poolSize=poolSize, recordDir=jiraConf.get("recordDir"),
+                replayDir=jiraConf.get("replayDir"))
 
 
 def check_valid_user(jiraConf):
-    jiraInst = Jira(url=jiraConf.get("url"))
+    jiraInst = get_jira(jiraConf)
 
     try:
         res = jiraInst.myself()
@@ -24,7 +46,209 @@ def check_valid_user(jiraConf):
     return validUser
 
 
-def run_jira_jql(jiraConf, jql, expand=None):
+def _log_transfer_metrics(jiraInst):
+    metrics = jiraInst.metrics
+
+    console.log(f"{metrics.get('requests')} requests:"
+                + f" {metrics.get('wireBytes') / 1e6:.2f} MB received"
+                + f" ({metrics.get('decodedBytes') / 1e6:.2f} MB decoded,"
+                + f" {metrics.get('uncompressed')} uncompressed),"
+                + f" {metrics.get('decodeTime'):.3f}s JSON decode ({metrics.get('decoder')})",
+                style="dim")
+
+
+def _get_truncated_changelogs(issues):
+    """Returns the issues whose embedded changelog does not include all histories"""
+
+    truncated = list()
+
+    for issue in issues:
+        changelog = issue.get("changelog")
+
+        if changelog and changelog.get("total", 0) > len(changelog.get("histories", [])):
+            truncated.append(issue)
+
+    return truncated
+
+
+def _complete_changelogs(jiraInst, issues, executor, pageSize=100):
+    """Fetches the histories missing from truncated embedded changelogs
+
+    The search endpoint only embeds the first page of an issue's changelog. The remaining pages
+    of every truncated changelog are requested concurrently (on executor, shared by the queries of a run)
+    from the paginated changelog endpoint and merged back into the issue (de-duplicated by history id).
+    """
+
+    truncated = _get_truncated_changelogs(issues)
+
+    if not truncated:
+        return
+
+    # total is known upfront so all remaining pages can be requested at once
+    pages = [(issue, startAt)
+             for issue in truncated
+             for startAt in range(len(issue["changelog"]["histories"]), issue["changelog"]["total"], pageSize)]
+
+    results = executor.map(
+            lambda page: jiraInst.changelog(page[0].get("key"), maxResults=pageSize, startAt=page[1]), pages)
+
+    for (issue, _), res in zip(pages, results):
+        changelog = issue["changelog"]
+        seen = {history.get("id") for history in changelog["histories"]}
+
+        changelog["histories"].extend(
+                history for history in res.get("values", []) if history.get("id") not in seen)
+
+    for issue in truncated:
+        issue["changelog"]["maxResults"] = len(issue["changelog"]["histories"])
+
+
+def get_sprint_ids(jiraConf, names):
+    """Maps sprint names to ids using the sprints of the configured board"""
+
+    jiraInst = get_jira(jiraConf)
+    sprintIds = dict()
+    startAt = 0
+
+    while True:
+        res = jiraInst.board_sprints(jiraConf.get("boardId"), startAt=startAt)
+        values = res.get("values", [])
+        sprintIds.update({sprint.get("name"): sprint.get("id") for sprint in values if sprint.get("name") in names})
+
+        startAt += len(values)
+
+        if res.get("isLast", True) or not values:
+            break
+
+    return sprintIds
+
+
+def get_sprint_queries(jiraConf, sprints, jql):
+    """Returns one query per sprint, using the agile API where the sprint is found on the configured board
+
+    Sprints not found on the board fall back to a single 'Sprint in (...)' search
+    """
+
+    if not jiraConf.get("boardId"):
+        return [f"Sprint in ({','.join(sprints)}) AND {jql}"]
+
+    sprintIds = get_sprint_ids(jiraConf, sprints)
+    queries = [SprintQuery(sprintIds.get(sprint), jql) for sprint in sprints if sprint in sprintIds]
+
+    if missing := [sprint for sprint in sprints if sprint not in sprintIds]:
+        console.log(f"[WARNING] Sprints not found on board {jiraConf.get('boardId')}: {', '.join(missing)}",
+                    style="bold yellow")
+        queries.append(f"Sprint in ({','.join(missing)}) AND {jql}")
+
+    return queries
+
+
+def _fetch_page(jiraInst, query, expand, fields, startAt=0):
+    if isinstance(query, SprintQuery):
+        return jiraInst.sprint_issues(query.sprintId, jql=query.jql, expand=expand, fields=fields, startAt=startAt)
+
+    return jiraInst.jql(query, expand=expand, fields=fields, startAt=startAt)
+
+
+def _produce_pages(jiraInst, query, expand, fields, pages, stop, onTotal, changelogExecutor):
+    """Fetches every page of a single query onto the pages queue, blocking while the queue is full"""
+
+    def _put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+
+        return False
+
+    try:
+        startAt = 0
+
+        while not stop.is_set():
+            res = _fetch_page(jiraInst, query, expand, fields, startAt=startAt)
+            issues = res.get("issues") or []
+
+            if startAt == 0:
+                onTotal(res.get("total", 0))
+
+            # embedded changelogs are truncated for long-lived issues
+            if expand and "changelog" in expand:
+                _complete_changelogs(jiraInst, issues, changelogExecutor)
+
+            if issues and not _put(issues):
+                return
+
+            # if more results than returned, paginate
+            startAt += len(issues)
+
+            if not issues or startAt >= res.get("total", 0):
+                break
+
+    except Exception as ex:
+        _put(ex)
+
+    finally:
+        _put(None)
+
+
+def _get_cached_issues(cacheUrl, queries, expand, fields):
+    """Requests the issues of the queries from the cache service (see utils/jira_cache.py)
+
+    Returns None if the service can't be reached or fails, so the caller can query Jira directly
+    """
+
+    body = {"queries": [query._asdict() if isinstance(query, SprintQuery) else query for query in queries],
+            "expand": expand,
+            "fields": fields}
+
+    try:
+        # the service may have to fetch the issues from Jira first
+        res = requests.post(f"{cacheUrl.rstrip('/')}/issues", json=body, timeout=(2, 600))
+
+    except requests.RequestException as ex:
+        console.log(f"[WARNING] Cache service {cacheUrl} unavailable ({type(ex).__name__}), querying Jira",
+                    style="bold yellow")
+        return None
+
+    if res.status_code != 200:
+        console.log(f"[WARNING] Cache service returned {res.status_code}, querying Jira", style="bold yellow")
+        return None
+
+    try:
+        issues = orjson.loads(res.content) if orjson else res.json()
+
+    # invalid body (orjson's and requests' JSONDecodeError are ValueErrors)
+    except ValueError:
+        console.log("[WARNING] Cache service returned an invalid response, querying Jira", style="bold yellow")
+        return None
+
+    console.log(f"{len(issues)} issues from cache service ({res.headers.get('X-Cache', 'unknown')})", style="dim")
+
+    return issues
+
+
+def iter_jira_pages(jiraConf, queries, expand=None, fields='*all', maxWorkers=SEARCH_WORKERS, maxQueued=8,
+                    jiraInst=None):
+    """Runs several queries (JQL strings or SprintQuery) concurrently, yielding pages of issues as they arrive
+
+    Pages are handed over through a bounded queue: fetchers block when maxQueued pages are waiting, so
+    the caller can process (e.g. parse) each page while the next ones are being retrieved without the
+    retrieved issues piling up in memory. Issues are de-duplicated by key across queries.
+
+    If jiraConf has a cacheUrl, the issues are requested from the cache service first.
+    """
+
+    if jiraConf.get("cacheUrl") and not (jiraConf.get("recordDir") or jiraConf.get("replayDir")):
+        issues = _get_cached_issues(jiraConf.get("cacheUrl"), queries, expand, fields)
+
+        if issues is not None:
+            for startAt in range(0, len(issues), 100):
+                yield issues[startAt:startAt + 100]
+
+            return
+
     progressParams = ("[progress.description]{task.description}",
                       BarColumn(),
                       "[progress.percentage]{task.percentage:>3.0f}%",
@@ -32,28 +256,67 @@ def run_jira_jql(jiraConf, jql, expand=None):
                       TimeRemainingColumn()
                       )
 
-    # instantiate jira object
-    jiraInst = Jira(url=jiraConf.get("url"))
+    searchWorkers = max(1, min(maxWorkers, len(queries)))
+
+    # instantiate jira object, with a pooled connection per concurrent request
+    jiraInst = jiraInst or get_jira(jiraConf, poolSize=searchWorkers + CHANGELOG_WORKERS)
+    pages = Queue(maxsize=maxQueued)
+    stop = Event()
+    lock = Lock()
 
-    with Progress(*progressParams) as progress:
+    # only one progress bar can be displayed at once, queries run by servers' request threads don't show any
+    with Progress(*progressParams, console=console, disable=current_thread() is not main_thread()) as progress:
         # create task for progress bar
-        task1 = progress.add_task("Retrieving Issues", start=False, total=0)
+        task1 = progress.add_task("Retrieving Issues", total=0)
 
-        # get results
-        res = jiraInst.jql(jql, expand=expand)
-        issues = res.get("issues")
-        nIssues = len(issues) if issues else 0
+        def _add_total(total):
+            with lock:
+                progress.update(task1, total=progress.tasks[task1].total + total)
 
-        # Update progress bar
-        total = res.get("total")
-        progress.update(task1, total=total, completed=nIssues)
-        progress.start_task(task1)
+        with ThreadPoolExecutor(max_workers=CHANGELOG_WORKERS) as changelogExecutor, \
+                ThreadPoolExecutor(max_workers=searchWorkers) as executor:
+            for query in queries:
+                executor.submit(_produce_pages, jiraInst, query, expand, fields, pages, stop, _add_total,
+                                changelogExecutor)
 
-        # if more results than returned, paginate
-        while nIssues < total:
-            issues.extend(jiraInst.jql(jql, startAt=len(issues), expand=expand).get("issues", []))
-            progress.update(task1, completed=len(issues))
+            remaining = len(queries)
+            seen = set()
 
-        progress.update(task1, completed=total)
+            try:
+                while remaining:
+                    page = pages.get()
 
-    return issues
+                    if page is None:
+                        remaining -= 1
+                        continue
+
+                    if isinstance(page, Exception):
+                        raise page
+
+                    progress.advance(task1, len(page))
+
+                    # keep the first occurrence of each issue
+                    page = [issue for issue in page if issue.get("key") not in seen]
+                    seen.update(issue.get("key") for issue in page)
+
+                    if page:
+                        yield page
+
+            finally:
+                stop.set()
+
+        progress.update(task1, completed=progress.tasks[task1].total)
+
+    _log_transfer_metrics(jiraInst)
+
+
+def run_jira_jqls(jiraConf, queries, expand=None, fields='*all', maxWorkers=SEARCH_WORKERS, jiraInst=None):
+    """Runs several queries (JQL strings or SprintQuery) concurrently, returning the combined issues
+    de-duplicated by key"""
+
+    return [issue for page in iter_jira_pages(jiraConf, queries, expand, fields, maxWorkers, jiraInst=jiraInst)
+            for issue in page]
+
+
+def run_jira_jql(jiraConf, jql, expand=None):
+    return run_jira_jqls(jiraConf, [jql], expand=expand)
@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+FORMATS = ("json", "csv", "markdown")
+EXTENSIONS = {"json": "json", "csv": "csv", "markdown": "md"}
+
+ISSUE_COLUMNS = ("key", "issueType", "epicKey", "summary", "status", "iteration", "teamName", "discipline",
+                 "spEstimate", "beEstimate", "feEstimate", "qaEstimate", "assignee", "warnings", "link")
+
+
+def _json_default(obj):
+    """Serializes the non-JSON types found in metrics"""
+
+    if isinstance(obj, set):
+        return sorted(obj)
+
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def iter_issues(metrics):
+    """Yields every epic and child issue in metrics"""
+
+    for epicKey, epic in metrics.get("epics").items():
+        if epic.get("key"):
+            yield epic
+
+        yield from epic.get("children").values()
+
+
+def _md_table(headings, rows):
+    lines = ["| " + " | ".join(headings) + " |",
+             "|" + "|".join(["---"] * len(headings)) + "|"]
+    lines += ["| " + " | ".join(str(cell).replace("|", "\\|") for cell in row) + " |" for row in rows]
+
+    return "\n".join(lines) + "\n"
+
+
+def _md_iteration_table(res, iterations, capacity=None):
+    """Per iteration table of res (e.g. load by discipline), optionally with capacity & delta rows"""
+
+    rows = list()
+
+    for k, v in sorted(res.items(), key=lambda x: x[0]):
+        load = [v.get(iter_, 0) for iter_ in iterations]
+        load.append(sum(load))
+
+        if capacity is None:
+            rows.append((k, "Completed", *load))
+            continue
+
+        cap = list(capacity.get(k.lower(), [0] * len(iterations)))
+        cap.append(sum(cap))
+
+        rows.append((k, "Capacity", *cap))
+        rows.append((k, "Load", *load))
+        rows.append((k, "Delta", *[c - l for c, l in zip(cap, load)]))
+
+    return _md_table(("", "", *iterations, "Totals"), rows)
+
+
+def to_json(metrics, iterations, capacity, progIncrement):
+    report = {"pi": progIncrement, "iterations": iterations, "capacity": capacity, "metrics": metrics}
+
+    return json.dumps(report, default=_json_default, indent=2) + "\n"
+
+
+def to_csv(metrics, iterations, capacity, progIncrement):
+    """One row per epic / issue"""
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(ISSUE_COLUMNS)
+
+    for issue in iter_issues(metrics):
+        row = [issue.get(col, "") for col in ISSUE_COLUMNS]
+        writer.writerow([";".join(item) if isinstance(item, list) else item for item in row])
+
+    return buffer.getvalue()
+
+
+def to_markdown(metrics, iterations, capacity, progIncrement, showWarnings=False, showAssignee=False):
+    sections = [f"# {progIncrement} Overview\n"]
+
+    # Feature Story Distribution
+    rows = list()
+    for k, v in metrics.get("epics").items():
+        children = v.get("children").items()
+        planned = ["<br>".join(f"{i} ({j.get('status')})" for i, j in children if j.get("iteration") == iteration)
+                   for iteration in iterations]
+        unplanned = "<br>".join(f"{i} ({j.get('status')})" for i, j in children if j.get("iteration") not in iterations)
+
+        rows.append((f"{v.get('summary', 'N/A')} ({k})", *planned, unplanned))
+
+    sections.append("## PI Feature Story Distribution\n")
+    sections.append(_md_table(("Feature", *iterations, "Unplanned"), rows))
+
+    # Feature Load Overview
+    columns = ("total", "completed", "remaining", "planned", "unplanned")
+    rows = [(k, *[v.get(col) for col in columns]) for k, v in sorted(metrics.get("loadOverview").items())]
+
+    sections.append("## Feature Load Overview\n")
+    sections.append(_md_table(("Discipline", *[col.capitalize() for col in columns]), rows))
+
+    # Iteration Load/Velocity Overviews
+    if showAssignee:
+        sections.append("## Iteration Overview By Assignee\n")
+        sections.append(_md_iteration_table(metrics.get("loadByAssignee"), iterations))
+
+    sections.append("## Iteration Load Overview By Discipline\n")
+    sections.append(_md_iteration_table(metrics.get("loadByDiscipline"), iterations, capacity))
+
+    sections.append("## Iteration Velocity Overview By Discipline\n")
+    sections.append(_md_iteration_table(metrics.get("velocityByDiscipline"), iterations))
+
+    # Warning Overview
+    if showWarnings:
+        rows = [(v.get("key"), "<br>".join(v.get("warnings")), v.get("teamName"), ",".join(v.get("discipline")),
+                 v.get("iteration"), v.get("link")) for k, v in sorted(metrics.get("warnings").items())]
+
+        sections.append("## Issues Warnings\n")
+        sections.append(_md_table(("Key", "Warnings", "Team", "Discipline(s)", "Iteration", "Link"), rows))
+
+    return "\n".join(sections)
+
+
+def format_report(outputFormat, metrics, iterations, capacity, progIncrement, showWarnings=False,
+                  showAssignee=False):
+    """Formats the PI overview metrics without rich layout"""
+
+    if outputFormat == "json":
+        return to_json(metrics, iterations, capacity, progIncrement)
+
+    if outputFormat == "csv":
+        return to_csv(metrics, iterations, capacity, progIncrement)
+
+    if outputFormat == "markdown":
+        return to_markdown(metrics, iterations, capacity, progIncrement, showWarnings, showAssignee)
+
+    raise ValueError(f"[ERROR] Unhandled output format: {outputFormat}")
@@ -0,0 +1,37 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+class ScopedContainer:
+    """Stands in for a module's data container, forwarding to the container of the current scope
+
+    Each scope (see scope()) has its own container, so report functions sharing state through the module's
+    container can run several times in a process, or concurrently in different threads, without their
+    state leaking into each other. Outside a scope a default container is used.
+    """
+
+    def __init__(self, factory):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_default", factory())
+        object.__setattr__(self, "_current", ContextVar(factory.__qualname__))
+
+    def _get(self):
+        return self._current.get(self._default)
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get(), name, value)
+
+    @contextmanager
+    def scope(self, **kwargs):
+        """Runs the enclosed code with a new container, created with kwargs"""
+
+        token = self._current.set(self._factory(**kwargs))
+
+        try:
+            yield self._current.get()
+
+        finally:
+            self._current.reset(token)
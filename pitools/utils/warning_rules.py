@@ -0,0 +1,173 @@
+import operator
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable
+
+import numpy as np
+
+
+@dataclass(frozen=True)
+class WarningRule:
+    """A compiled warning check
+
+    predicate is evaluated over columns (numpy arrays of issue fields) for a whole batch of issues at
+    once. The warning message is only formatted for the issues the rule fires on.
+
+    jql, where set, is a server side predicate matching (at least) every issue the rule fires on, allowing
+    the check to be pushed down into the query. fields lists the jira fields the rule needs to be evaluated
+    locally (all fields if empty).
+    """
+
+    name: str
+    predicate: Callable
+    warning: str
+    params: dict = field(default_factory=dict)
+    jql: str = None
+    fields: tuple = tuple()
+
+    def message(self, info):
+        return self.warning.format_map({**info, **self.params})
+
+
+def _is_empty(value):
+    return value in (None, "", "N/A", "NA", 0) or value == [] or value == ["na"]
+
+
+# operators available to rules defined in config
+OPERATORS = {
+    "=="       : operator.eq,
+    "!="       : operator.ne,
+    "<"        : operator.lt,
+    "<="       : operator.le,
+    ">"        : operator.gt,
+    ">="       : operator.ge,
+    "in"       : lambda col, value: np.fromiter((x in value for x in col), bool, len(col)),
+    "not in"   : lambda col, value: np.fromiter((x not in value for x in col), bool, len(col)),
+    "empty"    : lambda col, value: np.fromiter((_is_empty(x) for x in col), bool, len(col)),
+    "not empty": lambda col, value: np.fromiter((not _is_empty(x) for x in col), bool, len(col)),
+}
+
+
+def get_columns(infos, names=()):
+    """Builds the columns the rules are evaluated on from parsed issues"""
+
+    disciplines = [info.get("discipline") for info in infos]
+
+    columns = {
+        "iterNo"      : np.array([info.get("iterNo") for info in infos], dtype=float),
+        "teamName"    : np.array([info.get("teamName") for info in infos], dtype=object),
+        "epicKey"     : np.array([info.get("epicKey") for info in infos], dtype=object),
+        "discipline0" : np.array([discipline[0] for discipline in disciplines], dtype=object),
+        "nDisciplines": np.array([len(discipline) for discipline in disciplines], dtype=int),
+        "spEstimate"  : np.array([info.get("spEstimate") for info in infos], dtype=float),
+        "nEstimates"  : np.array([(info.get("beEstimate") > 0) + (info.get("feEstimate") > 0)
+                                  + (info.get("qaEstimate") > 0) for info in infos], dtype=int),
+    }
+
+    # if accepted or cancelled, doesn't matter. Skip
+    columns["skip"] = (np.array([bool(info.get("resolved")) for info in infos], dtype=bool)
+                       | np.array([info.get("issueType") == "Epic" for info in infos], dtype=bool)
+                       | ((columns["nDisciplines"] == 1) & np.array(["po/pm" in d for d in disciplines], dtype=bool)))
+
+    # additional raw fields used by config rules
+    for name in names:
+        if name not in columns:
+            columns[name] = np.empty(len(infos), dtype=object)
+            columns[name][:] = [info.get(name) for info in infos]
+
+    return columns
+
+
+def _compile_config_rule(conf):
+    """Compiles a rule from config: {"field": ..., "op": ..., "value": ..., "warning": ...}"""
+
+    field_, op, value = conf.get("field"), conf.get("op", "=="), conf.get("value")
+
+    if op not in OPERATORS:
+        raise ValueError(f"[ERROR] Unhandled warning rule operator ({op}) for field {field_}")
+
+    return WarningRule(name=conf.get("name", f"{field_} {op} {value}"),
+                       predicate=lambda cols: np.asarray(OPERATORS[op](cols[field_], value), dtype=bool),
+                       warning=conf.get("warning"),
+                       params={"field": field_, "value": value},
+                       jql=conf.get("jql"),
+                       fields=tuple(conf.get("fields", ())))
+
+
+@lru_cache
+def _compile_rules(teamName, configRules=()):
+    rules = [
+        # Check if issue is not scheduled to be completed in current PI
+        WarningRule("notScheduled",
+                    lambda cols: cols["iterNo"] == 1000,
+                    "Issue not scheduled in current PI",
+                    fields=("customfield_10007",)),
+        # Check if missing team name
+        WarningRule("teamName",
+                    lambda cols: cols["teamName"] != teamName,
+                    "Team Name ({teamName}) does not match the config ({configTeamName})",
+                    {"configTeamName": teamName},
+                    jql=f"('Team Name' != '{teamName}' OR 'Team Name' is EMPTY)",
+                    fields=("customfield_15500",)),
+        # Check if missing epic
+        WarningRule("epicLink",
+                    lambda cols: cols["epicKey"] == "N/A",
+                    "Issue not assigned to epic",
+                    jql="'Epic Link' is EMPTY",
+                    fields=("customfield_11000",)),
+        # Check if missing discipline
+        WarningRule("labels",
+                    lambda cols: cols["discipline0"] == "na",
+                    "Issue is missing labels",
+                    jql='(labels is EMPTY OR labels not in ("Server", "Web", "Qa/Automation", "PO/PM"))',
+                    fields=("labels",)),
+        # Check if missing sp estimate
+        WarningRule("spEstimate",
+                    lambda cols: cols["spEstimate"] == 0,
+                    "Issue has not been estimated",
+                    jql="('Story Points' is EMPTY OR 'Story Points' = 0)",
+                    fields=("customfield_10501",)),
+        # Check if the right number of discipline estimates are set
+        WarningRule("disciplineEstimates",
+                    lambda cols: (cols["nDisciplines"] > 1) & (cols["nEstimates"] != cols["nDisciplines"]),
+                    "Issue is missing discipline estimate",
+                    fields=("labels", "customfield_20500", "customfield_20501", "customfield_20502")),
+        WarningRule("extraEstimates",
+                    lambda cols: (cols["nDisciplines"] == 1) & (cols["nEstimates"] > 1),
+                    "Issue has more estimates than disciplines",
+                    # BE (cf[20501]), FE (cf[20500]) and QA (cf[20502]) estimates
+                    jql=("((cf[20501] > 0 AND cf[20500] > 0)"
+                         + " OR (cf[20501] > 0 AND cf[20502] > 0)"
+                         + " OR (cf[20500] > 0 AND cf[20502] > 0))"),
+                    fields=("labels", "customfield_20500", "customfield_20501", "customfield_20502")),
+    ]
+
+    return tuple(rules + [_compile_config_rule(dict(conf)) for conf in configRules])
+
+
+def compile_rules(jiraConf, configRules=None):
+    """Compiles the built-in rules and any rules defined in config. Compiled rules are cached"""
+
+    configRules = tuple(tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in conf.items()))
+                        for conf in configRules or ())
+
+    return _compile_rules(jiraConf.get("teamName"), configRules)
+
+
+def apply_warnings(infos, rules):
+    """Evaluates rules over a batch of parsed issues, setting each issue's warnings"""
+
+    for info in infos:
+        info["warnings"] = list()
+
+    if not infos:
+        return infos
+
+    columns = get_columns(infos, {rule.params.get("field") for rule in rules} - {None})
+    active = ~columns["skip"]
+
+    for rule in rules:
+        for idx in np.flatnonzero(rule.predicate(columns) & active):
+            infos[idx]["warnings"].append(rule.message(infos[idx]))
+
+    return infos